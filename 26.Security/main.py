@@ -2,6 +2,8 @@ from fastapi import FastAPI,Depends
 from pydantic import BaseModel
 from fastapi.exceptions import HTTPException
 from fastapi.security import OAuth2PasswordBearer,OAuth2PasswordRequestForm
+from ratelimit import LoginRateLimit,MemoryBuckets
+from userstore import SQLiteUserStore,UserStore
 
 app = FastAPI()
 
@@ -28,6 +30,9 @@ def fake_hashed_password(password:str):
 
 oauth2_scheme=OAuth2PasswordBearer(tokenUrl="token")
 
+# (attempts refilled per second, burst), swap MemoryBuckets for SQLiteBuckets("./rate_limits.db") to share limits between workers
+login_rate_limit=LoginRateLimit(MemoryBuckets(),per_ip=(1.0,10),per_username=(0.2,5))
+
 class User(BaseModel):
     username:str
     email:str|None=None
@@ -37,28 +42,29 @@ class User(BaseModel):
 class Userindb(User):
     hashed_password:str
 
-def get_user_indatabase(db,username:str):
-    if username in db :
-        user_dict=db[username]
-        return Userindb(**user_dict)
+user_store=SQLiteUserStore("./users.db",Userindb)
+for user_dict in fake_user_db.values(): # seed the store, rows that already exist are kept
+    user_store.add(Userindb(**user_dict))
+
+def get_user_indatabase(db:UserStore,username:str):
+    return db.get(username)
     
 def fake_decode_token(token):
-    return get_user_indatabase(fake_user_db,token)
+    return get_user_indatabase(user_store,token)
 
 
 async def create_current_user(token:str=Depends(oauth2_scheme)):
     user=fake_decode_token(token)
     if not user:
         raise HTTPException(status_code=400, detail="Invalid token",headers={"WWW-Authenticate":"Bearer"})
-    return fake_decode_token(token)
+    return user
 
 
-@app.post("/token")
+@app.post("/token",dependencies=[Depends(login_rate_limit)])
 async def login(form_data:OAuth2PasswordRequestForm=Depends()):
-    user_dict=fake_user_db.get(form_data.username)  # form bhaneko authorization ko forms
-    if not user_dict :
+    user=get_user_indatabase(user_store,form_data.username)  # form bhaneko authorization ko forms
+    if not user :
         raise HTTPException(status_code=400,detail="Incorrect username or password")
-    user=Userindb(**user_dict) # user
     hashed_password=fake_hashed_password(form_data.password)
     if not user.hashed_password == hashed_password:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
@@ -0,0 +1,95 @@
+import math
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from fastapi import Depends,HTTPException,Request,status
+from fastapi.security import OAuth2PasswordRequestForm
+
+# token buckets for the login endpoint: every attempt takes a token, tokens refill at `rate` per second up to `burst`
+
+
+class BucketBackend:
+    """Stores bucket levels. take() spends one token and returns 0, or returns the seconds until one is available."""
+
+    def take(self,key:str,rate:float,burst:int) -> float:
+        raise NotImplementedError
+
+    @staticmethod
+    def refill(tokens:float,updated:float,now:float,rate:float,burst:int) -> float:
+        return min(burst,tokens+(now-updated)*rate)
+
+
+class MemoryBuckets(BucketBackend):
+    """Per-process buckets, the least recently used keys are dropped past max_keys."""
+
+    def __init__(self,max_keys:int=100_000):
+        self.max_keys=max_keys
+        self.buckets:OrderedDict[str,tuple[float,float]]=OrderedDict()
+        self.lock=Lock()
+
+    def take(self,key:str,rate:float,burst:int) -> float:
+        now=time.monotonic()
+        with self.lock:
+            tokens,updated=self.buckets.get(key,(burst,now))
+            tokens=self.refill(tokens,updated,now,rate,burst)
+            wait=0.0 if tokens >= 1 else (1-tokens)/rate
+            self.buckets[key]=(tokens-1 if not wait else tokens,now)
+            self.buckets.move_to_end(key)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+            return wait
+
+
+class SQLiteBuckets(BucketBackend):
+    """Buckets in a sqlite file, shared by every worker process that opens the same path."""
+
+    def __init__(self,path:str):
+        self.db=sqlite3.connect(path,check_same_thread=False,isolation_level=None)
+        # bucket levels are cheap to lose on a crash, so skip the fsync on every commit
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS rate_limit_buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+        self.lock=Lock()
+
+    def take(self,key:str,rate:float,burst:int) -> float:
+        now=time.time() # wall clock, monotonic clocks are not comparable across processes
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row=self.db.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?",(key,)).fetchone()
+                tokens=self.refill(*(row or (burst,now)),now,rate,burst)
+                wait=0.0 if tokens >= 1 else (1-tokens)/rate
+                self.db.execute(
+                    "INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                    (key,tokens-1 if not wait else tokens,now),
+                )
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            return wait
+
+
+class LoginRateLimit:
+    """Dependency for the /token route, rejects with 429 and Retry-After before any password is hashed."""
+
+    def __init__(self,backend:BucketBackend,per_ip:tuple[float,int]=(1.0,10),per_username:tuple[float,int]=(0.2,5)):
+        self.backend=backend
+        self.per_ip=per_ip # (tokens per second, burst)
+        self.per_username=per_username
+
+    def check(self,client:str,username:str):
+        wait=self.backend.take(f"ip:{client}",*self.per_ip) or self.backend.take(f"user:{username}",*self.per_username)
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    def __call__(self,request:Request,form_data:OAuth2PasswordRequestForm=Depends()):
+        # a plain def so it runs in the threadpool, SQLiteBuckets may wait on another process's write lock
+        self.check(request.client.host if request.client else "unknown",form_data.username)
@@ -0,0 +1,114 @@
+"""
+Load tests for the JWT app, run from this folder with: python bench.py
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+import main
+from ratelimit import LoginRateLimit,MemoryBuckets,SQLiteBuckets
+
+USERNAME="loadtest"
+PASSWORD="loadtest-password"
+
+
+def add_load_test_user():
+    main.user_store.add(main.UserInDB(
+        username=USERNAME,
+        email="loadtest@example.com",
+        full_name="Load Test",
+        hashed_password=main.get_password_hash(PASSWORD),
+        disabled=False,
+    ),replace=True)
+
+
+async def verify_inline(function,*args):
+    # how login verified passwords before the hash pool, straight on the event loop
+    return function(*args)
+
+
+async def me_latencies(client,token:str,requests:int,interval:float=0.01):
+    # requests go out on a fixed schedule and latency counts from the scheduled time,
+    # so time spent waiting for a blocked event loop shows up instead of being skipped
+    latencies=[]
+    started=time.perf_counter()
+    for n in range(requests):
+        scheduled=started+n*interval
+        await asyncio.sleep(max(0,scheduled-time.perf_counter()))
+        response=await client.get("/users/me",headers={"Authorization": f"Bearer {token}"})
+        latencies.append(time.perf_counter()-scheduled)
+        response.raise_for_status()
+    return latencies
+
+
+async def login_storm(client,logins:int,concurrency:int):
+    semaphore=asyncio.Semaphore(concurrency)
+    async def login():
+        async with semaphore:
+            await client.post("/token",data={"username": USERNAME,"password": PASSWORD})
+    await asyncio.gather(*(login() for _ in range(logins)))
+
+
+async def measure(logins:int,concurrency:int,requests:int):
+    transport=httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport,base_url="http://bench") as client:
+        response=await client.post("/token",data={"username": USERNAME,"password": PASSWORD})
+        token=response.json()["access_token"]
+        idle=await me_latencies(client,token,requests)
+        storm=asyncio.create_task(login_storm(client,logins,concurrency))
+        loaded=await me_latencies(client,token,requests)
+        await storm
+    return idle,loaded
+
+
+def bench_me_under_login_load(logins:int=40,concurrency:int=8,requests:int=200):
+    add_load_test_user()
+    main.login_rate_limit.per_ip=main.login_rate_limit.per_username=(1e9,10**9) # the storm is not an attack
+    run_in_hash_pool=main.run_in_hash_pool
+    print(f"/users/me latency while {logins} logins run {concurrency} at a time")
+    for name,runner in (("inline bcrypt",verify_inline),("hash pool",run_in_hash_pool)):
+        main.run_in_hash_pool=runner
+        idle,loaded=asyncio.run(measure(logins,concurrency,requests))
+        print(f"  {name:<14} idle p50 {statistics.median(idle)*1000:8.2f} ms   "
+              f"under load p50 {statistics.median(loaded)*1000:8.2f} ms  max {max(loaded)*1000:8.2f} ms")
+    main.run_in_hash_pool=run_in_hash_pool
+
+
+async def time_auth(token:str,requests:int):
+    start=time.perf_counter()
+    for _ in range(requests):
+        await main.get_current_active_user(await main.get_current_user(await main.get_verified_token(token)))
+    return (time.perf_counter()-start)/requests
+
+
+def bench_auth_overhead(requests:int=100_000):
+    add_load_test_user()
+    token=main.create_access_token(data={"sub": USERNAME},expires_delta=main.timedelta(minutes=5))
+    token_cache=main.token_cache
+    print(f"auth dependency cost per /users/me request, {requests} requests")
+    for name,cache in (("no cache",main.VerifiedTokenCache(maxsize=0)),("token cache",main.VerifiedTokenCache(maxsize=1000))):
+        main.token_cache=cache
+        elapsed=asyncio.run(time_auth(token,requests))
+        print(f"  {name:<12} {elapsed*1_000_000:8.2f} us")
+    main.token_cache=token_cache
+
+
+def bench_rate_limit_overhead(requests:int=50_000):
+    path=os.path.join(tempfile.mkdtemp(),"rate_limits.db")
+    print(f"login rate limiter cost per /token request, {requests} requests over 1000 clients")
+    for name,backend in (("memory",MemoryBuckets()),("sqlite",SQLiteBuckets(path))):
+        limiter=LoginRateLimit(backend,per_ip=(1e9,10**9),per_username=(1e9,10**9))
+        start=time.perf_counter()
+        for n in range(requests):
+            limiter.check(f"10.0.{n%1000//256}.{n%256}",f"user{n%1000}")
+        print(f"  {name:<7} {(time.perf_counter()-start)/requests*1_000_000:8.2f} us")
+
+
+if __name__ == "__main__":
+    bench_me_under_login_load()
+    bench_auth_overhead()
+    bench_rate_limit_overhead()
@@ -0,0 +1,30 @@
+import importlib.util
+import os
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from revocation import RevocationList
+
+
+@pytest.fixture
+def revocation_path():
+    # a throwaway revocation db per test, revoked_tokens.db is never touched
+    return os.path.join(tempfile.mkdtemp(),"revoked_tokens.db")
+
+
+@pytest.fixture
+def jwt_app(monkeypatch,tmp_path,revocation_path):
+    monkeypatch.chdir(tmp_path) # main opens ./users.db and ./revoked_tokens.db on import
+    # loaded from its path under its own name, other lessons have a main module too
+    spec=importlib.util.spec_from_file_location("jwt_main",os.path.join(os.path.dirname(__file__),"main.py"))
+    main=importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(main)
+    monkeypatch.setattr(main,"revoked_tokens",RevocationList(revocation_path))
+    return main
+
+
+@pytest.fixture
+def jwt_client(jwt_app):
+    return TestClient(jwt_app.app)
@@ -1,18 +1,39 @@
+import asyncio
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI,Depends,status
 from pydantic import BaseModel
 from passlib.context import CryptContext
 import jwt
-from jose import JWTError
 from fastapi.security import OAuth2PasswordBearer,OAuth2PasswordRequestForm
 from fastapi.exceptions import HTTPException
 from datetime import datetime,timedelta,timezone
+from ratelimit import LoginRateLimit,MemoryBuckets
+from revocation import RevocationList
+from userstore import SQLiteUserStore,UserStore
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app:FastAPI):
+    revoked_tokens.start() # picks up other workers' logouts and purges expired ones
+    yield
+    revoked_tokens.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 
 SECRET_KEY="thequickbrownfoxjumpsoverthelazydog"
 ALGORITHM="HS256"
 ACCESS_TOKENS_EXPIRATION_MINUTE=30
+PASSWORD_HASH_WORKERS=4 # at most this many bcrypt hashes/verifications run at once
+VERIFIED_TOKEN_CACHE_SIZE=10_000
+REVOKED_TOKENS_DATABASE="./revoked_tokens.db"
+USERS_DATABASE="./users.db"
+LOGIN_RATE_PER_IP=(1.0,10) # (attempts refilled per second, burst)
+LOGIN_RATE_PER_USERNAME=(0.2,5)
 
 fake_user_db=dict(
     johndoe=dict(
@@ -40,8 +61,15 @@ class User(BaseModel):
 class UserInDB(User):
     hashed_password:str
 
+user_store=SQLiteUserStore(USERS_DATABASE,UserInDB)
+for user_dict in fake_user_db.values(): # seed the store, rows that already exist are kept
+    user_store.add(UserInDB(**user_dict))
+
 pwd_context=CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt takes ~200ms of cpu and releases the GIL, so it runs here instead of on the event loop
+password_hash_pool=ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
 oauth2_scheme=OAuth2PasswordBearer(tokenUrl="token")
 
 def verify_password(plain_password,hashed_password):
@@ -49,19 +77,26 @@ def verify_password(plain_password,hashed_password):
 
 def get_password_hash(password):
     return pwd_context.hash(password)
-def get_user(db,username):
-    if username in db:
-        user_dict=db[username]
-        print(user_dict)
-        return UserInDB(**user_dict)
-
-def authenticate_user(fake_db,username:str,password:str):
-    user=get_user(fake_db,username)
+
+async def run_in_hash_pool(function,*args):
+    return await asyncio.get_running_loop().run_in_executor(password_hash_pool,function,*args)
+
+def get_user(db:UserStore,username):
+    return db.get(username)
+
+async def authenticate_user(db:UserStore,username:str,password:str):
+    user=get_user(db,username)
     if not user:
         return False
-    if not verify_password(password,user.hashed_password):
+    verified,new_hash=await run_in_hash_pool(pwd_context.verify_and_update,password,user.hashed_password)
+    if not verified:
         return False
-    return user 
+    if new_hash: # the stored hash uses outdated settings, swap it while we have the plain password
+        user=db.update(username,hashed_password=new_hash)
+    return user
+
+# swap MemoryBuckets for SQLiteBuckets("./rate_limits.db") to share limits between worker processes
+login_rate_limit=LoginRateLimit(MemoryBuckets(),per_ip=LOGIN_RATE_PER_IP,per_username=LOGIN_RATE_PER_USERNAME)
 
 def create_access_token(data:dict,expires_delta:timedelta|None=None):
     to_encode=data.copy()
@@ -69,13 +104,13 @@ def create_access_token(data:dict,expires_delta:timedelta|None=None):
         expire=datetime.now(timezone.utc) + expires_delta
     else:
         expire=datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex}) # jti lets a single token be revoked
     encoded_jwt=jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-@app.post("/token",response_model=Token)
+@app.post("/token",response_model=Token,dependencies=[Depends(login_rate_limit)])
 async def login_for_access_token(form_Data:OAuth2PasswordRequestForm=Depends()):
-    user=authenticate_user(fake_user_db,form_Data.username,form_Data.password)
+    user=await authenticate_user(user_store,form_Data.username,form_Data.password)
     if not user:
         raise HTTPException(status_code=400,detail="Invalid username or password")
     access_token_expires=timedelta(minutes=ACCESS_TOKENS_EXPIRATION_MINUTE)
@@ -84,21 +119,72 @@ async def login_for_access_token(form_Data:OAuth2PasswordRequestForm=Depends()):
     )
     return {"access_token": acess_token, "token_type": "bearer"}
 
-async def get_current_user(token:str=Depends(oauth2_scheme)):
+class VerifiedTokenCache:
+    """Claims of tokens that already passed signature verification, kept until the token's exp.
+    The user is not cached here, every request resolves it through user_store so changes show up at once."""
+
+    def __init__(self,maxsize:int):
+        self.maxsize=maxsize
+        self.entries:OrderedDict[bytes,tuple[float,dict]]=OrderedDict()
+
+    @staticmethod
+    def digest(token:str) -> bytes:
+        # the raw token is a bearer credential, only its hash is kept around
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self,token:str) -> dict|None:
+        key=self.digest(token)
+        entry=self.entries.get(key)
+        if entry is None:
+            return None
+        expires,claims=entry
+        if expires <= time.time():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return claims
+
+    def put(self,token:str,claims:dict):
+        key=self.digest(token)
+        self.entries[key]=(claims["exp"],claims)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def evict_token(self,token:str):
+        self.entries.pop(self.digest(token),None)
+
+token_cache=VerifiedTokenCache(maxsize=VERIFIED_TOKEN_CACHE_SIZE)
+revoked_tokens=RevocationList(REVOKED_TOKENS_DATABASE)
+
+async def get_verified_token(token:str=Depends(oauth2_scheme)) -> tuple[dict,UserInDB]:
     credential_Exception=HTTPException(
        status_code=status.HTTP_401_UNAUTHORIZED,
        detail="Could not Validate Credentials",
        headers={"www-Authenticate": "Bearer"}
    )
+    claims=token_cache.get(token) or verify_token(token,credential_Exception)
+    if revoked_tokens.is_revoked(claims.get("jti","")): # a bloom filter probe unless the token really was revoked
+        raise credential_Exception
+    user=get_user(user_store,username=claims["sub"]) # served from the store's own cache of validated users
+    if user is None:
+        raise credential_Exception
+    return claims,user
+
+def verify_token(token:str,credential_Exception:HTTPException) -> dict:
     try:
        payload=jwt.decode(token,SECRET_KEY,algorithms=[ALGORITHM])
        username:str=payload.get("sub")
-       if username is not None:
+       if username is None:
            raise credential_Exception
-       token_data=token_Data(username)
-    except JWTError:
+    except jwt.InvalidTokenError:
         raise credential_Exception
-    user=get_user(fake_user_db,username=token_data.username)
+    token_cache.put(token,payload)
+    return payload
+
+async def get_current_user(verified:tuple[dict,UserInDB]=Depends(get_verified_token)):
+    claims,user=verified
+    return user
 
 
 
@@ -107,6 +193,14 @@ async def get_current_active_user(current_user:User=Depends(get_current_user)):
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
     
+@app.post("/logout",status_code=status.HTTP_204_NO_CONTENT)
+async def logout(token:str=Depends(oauth2_scheme),verified:tuple[dict,UserInDB]=Depends(get_verified_token)):
+    claims,user=verified
+    if "jti" not in claims:
+        raise HTTPException(status_code=400, detail="Token cannot be revoked")
+    await asyncio.to_thread(revoked_tokens.revoke,claims["jti"],claims["exp"])
+    token_cache.evict_token(token)
+
 @app.get("/users/me",response_model=User)
 async def get_me(current_user:User=Depends(get_current_active_user)):
     return current_user
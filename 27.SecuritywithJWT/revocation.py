@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import math
+import sqlite3
+import time
+from threading import Event,Lock,Thread
+
+logger=logging.getLogger(__name__)
+
+# logout/revocation for stateless JWTs: revoked jti values live in sqlite, and a bloom filter in front of the table
+# answers the common "never revoked" case from memory. Every process sharing the file keeps its own filter, a thread
+# started by start() pulls in rows added by the others every refresh_every seconds, so a logout reaches all workers
+# within that window, and rebuilds the filter without expired rows every purge_every seconds.
+# The event loop only ever reads the filter and, on a maybe, looks the jti up on its own connection; everything that
+# writes (revoke, refresh, purge) runs in threads on a second connection and takes the lock.
+
+
+class BloomFilter:
+    """Set membership with no false negatives and about false_positive_rate false positives at capacity."""
+
+    def __init__(self,capacity:int=100_000,false_positive_rate:float=0.01):
+        self.size=max(8,int(-capacity*math.log(false_positive_rate)/math.log(2)**2))
+        self.hashes=max(1,round(self.size/capacity*math.log(2)))
+        self.bits=bytearray((self.size+7)//8)
+
+    def positions(self,key:str):
+        digest=hashlib.blake2b(key.encode(),digest_size=16).digest()
+        first,second=int.from_bytes(digest[:8],"little"),int.from_bytes(digest[8:],"little")|1
+        return ((first+i*second)%self.size for i in range(self.hashes))
+
+    def add(self,key:str):
+        for position in self.positions(key):
+            self.bits[position>>3]|=1<<(position&7)
+
+    def __contains__(self,key:str) -> bool:
+        return all(self.bits[position>>3]&(1<<(position&7)) for position in self.positions(key))
+
+
+class RevocationList:
+    """Revoked token ids until their exp, rows past exp are purged and the filter rebuilt without them."""
+
+    def __init__(self,path:str,capacity:int=100_000,purge_every:float=300.0,refresh_every:float=1.0):
+        self.db=sqlite3.connect(path,check_same_thread=False) # lookups, from the event loop
+        self.writer=sqlite3.connect(path,check_same_thread=False) # revoke, refresh and purge, from threads
+        self.writer.execute("PRAGMA journal_mode=WAL") # lookups are not blocked by a revoke's commit
+        # AUTOINCREMENT so ids are never reused after a purge, "id > last seen" then finds every new row
+        self.writer.execute("CREATE TABLE IF NOT EXISTS revoked_token_ids (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                            "jti TEXT NOT NULL UNIQUE, expires_at REAL NOT NULL)")
+        self.writer.execute("CREATE INDEX IF NOT EXISTS ix_revoked_token_ids_expires_at ON revoked_token_ids (expires_at)")
+        self.capacity=capacity
+        self.purge_every=purge_every
+        self.refresh_every=refresh_every
+        self.lock=Lock() # the writer connection and changes to the filter, never taken on the event loop
+        self.stopping=Event()
+        self.purge()
+
+    def start(self):
+        self.stopping.clear()
+        Thread(target=self.maintain,name="revocation-list",daemon=True).start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def maintain(self):
+        while not self.stopping.wait(self.refresh_every):
+            try:
+                if time.monotonic()-self.purged_at >= self.purge_every:
+                    self.purge()
+                else:
+                    self.refresh()
+            except Exception: # a locked or missing file, try again on the next round
+                logger.exception("refreshing the revocation list failed")
+
+    def purge(self):
+        with self.lock:
+            with self.writer:
+                self.writer.execute("DELETE FROM revoked_token_ids WHERE expires_at <= ?",(time.time(),))
+            bloom=BloomFilter(self.capacity)
+            last_id=0
+            for row_id,jti in self.writer.execute("SELECT id, jti FROM revoked_token_ids"):
+                bloom.add(jti)
+                last_id=max(last_id,row_id)
+            self.bloom,self.last_id=bloom,last_id # lookups switch to the new filter in one assignment
+            self.purged_at=time.monotonic()
+
+    def refresh(self):
+        """Add what other processes revoked since the last look to this process's filter."""
+        with self.lock:
+            for row_id,jti in self.writer.execute("SELECT id, jti FROM revoked_token_ids WHERE id > ?",(self.last_id,)):
+                self.bloom.add(jti)
+                self.last_id=max(self.last_id,row_id)
+
+    def revoke(self,jti:str,expires_at:float):
+        # a sqlite commit, call it from a thread (asyncio.to_thread) and not on the event loop
+        with self.lock:
+            with self.writer:
+                self.writer.execute("INSERT OR IGNORE INTO revoked_token_ids (jti, expires_at) VALUES (?, ?)",(jti,expires_at))
+            self.bloom.add(jti)
+
+    def is_revoked(self,jti:str) -> bool:
+        if jti not in self.bloom:
+            return False
+        # a maybe from the filter, only now does the lookup touch sqlite
+        row=self.db.execute("SELECT 1 FROM revoked_token_ids WHERE jti = ? AND expires_at > ?",(jti,time.time())).fetchone()
+        return row is not None
@@ -0,0 +1,37 @@
+import os
+import tempfile
+
+from fastapi import Depends,FastAPI
+from fastapi.testclient import TestClient
+
+from ratelimit import LoginRateLimit,MemoryBuckets,SQLiteBuckets
+
+
+def test_memory_buckets_refill_at_rate():
+    buckets=MemoryBuckets()
+    assert [buckets.take("ip:a",1.0,2) for _ in range(2)] == [0.0,0.0]
+    assert 0 < buckets.take("ip:a",1.0,2) <= 1.0
+    assert buckets.take("ip:b",1.0,2) == 0.0 # every key has its own bucket
+
+def test_sqlite_buckets_are_shared_through_the_file():
+    path=os.path.join(tempfile.mkdtemp(),"rate_limits.db")
+    worker_a,worker_b=SQLiteBuckets(path),SQLiteBuckets(path)
+    assert worker_a.take("user:johndoe",0.2,2) == 0.0
+    assert worker_b.take("user:johndoe",0.2,2) == 0.0
+    assert 0 < worker_a.take("user:johndoe",0.2,2) <= 5.0
+
+def test_login_rate_limit_answers_429_with_retry_after():
+    app=FastAPI()
+    limit=LoginRateLimit(MemoryBuckets(),per_ip=(1.0,10),per_username=(0.1,2))
+
+    @app.post("/token",dependencies=[Depends(limit)])
+    def token():
+        return {}
+
+    client=TestClient(app)
+    form={"username": "johndoe","password": "wrong"}
+    assert [client.post("/token",data=form).status_code for _ in range(2)] == [200,200]
+    response=client.post("/token",data=form)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "10"
+    assert client.post("/token",data={"username": "janedoe","password": "wrong"}).status_code == 200
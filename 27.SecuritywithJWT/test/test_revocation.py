@@ -0,0 +1,55 @@
+import time
+
+from revocation import RevocationList
+
+
+def auth(token:str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_logout_rejects_reuse(jwt_app,jwt_client):
+    token=jwt_app.create_access_token({"sub": "johndoe"})
+    assert jwt_client.get("/users/me",headers=auth(token)).status_code == 200
+    assert jwt_client.post("/logout",headers=auth(token)).status_code == 204
+    assert jwt_client.get("/users/me",headers=auth(token)).status_code == 401
+    assert jwt_client.post("/logout",headers=auth(token)).status_code == 401
+    other=jwt_app.create_access_token({"sub": "johndoe"}) # only the logged out token is affected
+    assert jwt_client.get("/users/me",headers=auth(other)).status_code == 200
+
+
+def test_revocation_reaches_other_processes(revocation_path):
+    # two lists on one file stand in for two workers, each with its own bloom filter
+    worker_a=RevocationList(revocation_path)
+    worker_b=RevocationList(revocation_path,refresh_every=0.01)
+    worker_b.start()
+    assert not worker_b.is_revoked("abc")
+    worker_a.revoke("abc",time.time()+60)
+    time.sleep(0.1)
+    worker_b.stop()
+    assert worker_b.is_revoked("abc")
+
+
+def test_expired_revocations_are_purged(revocation_path):
+    revocations=RevocationList(revocation_path,purge_every=0.1,refresh_every=0.01)
+    revocations.revoke("short",time.time()+0.1)
+    revocations.revoke("long",time.time()+60)
+    assert revocations.is_revoked("short")
+    time.sleep(0.2)
+    assert not revocations.is_revoked("short") # the token expired anyway
+    revocations.start() # purges on its own, nothing has to call revoke
+    time.sleep(0.2)
+    revocations.stop()
+    assert revocations.db.execute("SELECT jti FROM revoked_token_ids").fetchall() == [("long",)]
+    assert "long" in revocations.bloom
+    # ids are not reused after a purge, so other processes still pick up new rows
+    other=RevocationList(revocation_path)
+    revocations.revoke("later",time.time()+60)
+    other.refresh()
+    assert other.is_revoked("later")
+
+def test_lookups_do_not_wait_for_a_revoke(revocation_path):
+    revocations=RevocationList(revocation_path)
+    revocations.revoke("abc",time.time()+60)
+    with revocations.lock: # as if a revoke were committing in a worker thread
+        assert revocations.is_revoked("abc")
+        assert not revocations.is_revoked("xyz")
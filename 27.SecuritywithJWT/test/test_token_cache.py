@@ -0,0 +1,31 @@
+import time
+
+
+def auth(token:str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_claims_are_cached_until_exp(jwt_app):
+    cache=jwt_app.VerifiedTokenCache(maxsize=2)
+    cache.put("soon",{"sub": "johndoe","exp": time.time()+0.1})
+    cache.put("later",{"sub": "johndoe","exp": time.time()+60})
+    assert cache.get("soon")["sub"] == "johndoe"
+    time.sleep(0.15)
+    assert cache.get("soon") is None
+    cache.put("third",{"sub": "johndoe","exp": time.time()+60})
+    cache.put("fourth",{"sub": "johndoe","exp": time.time()+60})
+    assert cache.get("later") is None # least recently used, past maxsize
+
+def test_logout_evicts_the_cached_claims(jwt_app,jwt_client):
+    token=jwt_app.create_access_token({"sub": "johndoe"})
+    jwt_client.get("/users/me",headers=auth(token))
+    assert jwt_app.token_cache.get(token) is not None
+    jwt_client.post("/logout",headers=auth(token))
+    assert jwt_app.token_cache.get(token) is None
+
+def test_disabled_user_is_rejected_on_the_next_request(jwt_app,jwt_client):
+    token=jwt_app.create_access_token({"sub": "johndoe"})
+    assert jwt_client.get("/users/me",headers=auth(token)).status_code == 200
+    jwt_app.user_store.update("johndoe",disabled=True)
+    response=jwt_client.get("/users/me",headers=auth(token))
+    assert (response.status_code,response.json()["detail"]) == (400,"Inactive user")
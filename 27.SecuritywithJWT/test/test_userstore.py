@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+import pytest
+from pydantic import BaseModel
+
+from userstore import SQLiteUserStore
+
+
+class Member(BaseModel):
+    username:str
+    email:str|None=None
+    disabled:bool=False
+
+
+@pytest.fixture
+def users_path():
+    return os.path.join(tempfile.mkdtemp(),"users.db")
+
+
+def test_a_hit_moves_the_user_to_the_young_end(users_path):
+    store=SQLiteUserStore(users_path,Member,cache_size=2)
+    for name in ("a","b","c"):
+        store.add(Member(username=name,email=f"{name}@example.com"))
+    store.get("a")
+    store.get("b")
+    store.get("a") # b is now the least recently used
+    store.get("c")
+    assert list(store.cache) == ["a","c"]
+
+def test_eviction_drops_the_email_pointer(users_path):
+    store=SQLiteUserStore(users_path,Member,cache_size=1)
+    store.add(Member(username="a",email="a@example.com"))
+    store.add(Member(username="b",email="b@example.com"))
+    store.get_by_email("a@example.com")
+    store.get_by_email("b@example.com")
+    assert store.emails == {"b@example.com": "b"}
+
+def test_an_email_conflict_raises_instead_of_deleting_the_other_user(users_path):
+    store=SQLiteUserStore(users_path,Member)
+    store.add(Member(username="a",email="shared@example.com"))
+    store.add(Member(username="b",email="b@example.com"))
+    with pytest.raises(sqlite3.IntegrityError):
+        store.add(Member(username="b",email="shared@example.com"),replace=True)
+    assert store.get("a").email == "shared@example.com"
+    assert store.get("b").email == "b@example.com"
+    assert store.update("b",disabled=True).disabled and store.get("b").disabled
+
+def test_updates_from_another_process_show_up_after_ttl(users_path):
+    worker_a=SQLiteUserStore(users_path,Member,ttl=0.1)
+    worker_b=SQLiteUserStore(users_path,Member)
+    worker_b.add(Member(username="a"))
+    assert not worker_a.get("a").disabled
+    worker_b.update("a",disabled=True)
+    assert not worker_a.get("a").disabled # still cached
+    time.sleep(0.15)
+    assert worker_a.get("a").disabled
@@ -0,0 +1,105 @@
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Generic,TypeVar
+
+from pydantic import BaseModel
+
+# user lookups for the security examples, rows live in sqlite and validated models are cached in memory
+
+UserModel=TypeVar("UserModel",bound=BaseModel)
+
+
+class UserStore(Generic[UserModel]):
+    """Where users live, looked up by username or email."""
+
+    def get(self,username:str) -> UserModel|None:
+        raise NotImplementedError
+
+    def get_by_email(self,email:str) -> UserModel|None:
+        raise NotImplementedError
+
+    def add(self,user:UserModel,replace:bool=False):
+        raise NotImplementedError
+
+    def update(self,username:str,**changes) -> UserModel|None:
+        user=self.get(username)
+        if user is None:
+            return None
+        user=user.model_copy(update=changes)
+        self.add(user,replace=True)
+        return user
+
+
+class SQLiteUserStore(UserStore[UserModel]):
+    """Users as JSON rows keyed by username with a unique email index, validated models kept in an LRU.
+    Cached users are re-read after ttl seconds, that is how an update() made by another worker process shows up here."""
+
+    def __init__(self,path:str,model:type[UserModel],cache_size:int=10_000,ttl:float=5.0):
+        self.model=model
+        self.db=sqlite3.connect(path,check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, email TEXT, data TEXT NOT NULL)")
+        self.db.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)")
+        self.cache_size=cache_size
+        self.ttl=ttl
+        self.cache:OrderedDict[str,tuple[float,UserModel]]=OrderedDict() # username -> (expires, user)
+        self.emails:dict[str,str]={}
+        self.lock=Lock()
+
+    def remember(self,user:UserModel) -> UserModel:
+        with self.lock:
+            self.cache[user.username]=(time.monotonic()+self.ttl,user)
+            self.cache.move_to_end(user.username)
+            if user.email:
+                self.emails[user.email]=user.username
+            if len(self.cache) > self.cache_size:
+                _,evicted=self.cache.popitem(last=False)[1]
+                self.emails.pop(evicted.email,None)
+        return user
+
+    def forget(self,username:str):
+        with self.lock:
+            self._forget(username)
+
+    def _forget(self,username:str):
+        entry=self.cache.pop(username,None)
+        if entry is not None:
+            self.emails.pop(entry[1].email,None)
+
+    def touch(self,username:str) -> UserModel|None:
+        # a hit moves the user to the young end, that is what makes the cache LRU and not FIFO
+        with self.lock:
+            entry=self.cache.get(username)
+            if entry is None:
+                return None
+            expires,user=entry
+            if expires <= time.monotonic():
+                self._forget(username)
+                return None
+            self.cache.move_to_end(username)
+            return user
+
+    def get(self,username:str) -> UserModel|None:
+        user=self.touch(username)
+        if user is not None:
+            return user
+        row=self.db.execute("SELECT data FROM users WHERE username = ?",(username,)).fetchone()
+        return None if row is None else self.remember(self.model.model_validate_json(row[0]))
+
+    def get_by_email(self,email:str) -> UserModel|None:
+        username=self.emails.get(email)
+        user=self.touch(username) if username is not None else None
+        if user is not None:
+            return user
+        row=self.db.execute("SELECT data FROM users WHERE email = ?",(email,)).fetchone()
+        return None if row is None else self.remember(self.model.model_validate_json(row[0]))
+
+    def add(self,user:UserModel,replace:bool=False):
+        # only a username conflict is resolved here, an email taken by another user raises sqlite3.IntegrityError
+        # (INSERT OR REPLACE would quietly delete that other user instead)
+        conflict="DO UPDATE SET email = excluded.email, data = excluded.data" if replace else "DO NOTHING"
+        with self.db:
+            self.db.execute(f"INSERT INTO users (username, email, data) VALUES (?, ?, ?) ON CONFLICT(username) {conflict}",
+                            (user.username,user.email,user.model_dump_json()))
+        self.forget(user.username) # the next get validates whatever is stored now
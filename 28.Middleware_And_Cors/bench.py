@@ -0,0 +1,129 @@
+"""
+Middleware overhead on /blah, run from this folder with: python bench.py
+
+Requests are driven straight through the ASGI interface so no client or server cost is mixed in.
+"""
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI,Request
+from metrics import Metrics
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.cors import CORSMiddleware
+
+from compression import Compressor,brotli
+from cors import CompiledCORSMiddleware
+from timing import ServerTimingMiddleware,TimedRoute
+
+
+# the first version of main.py's timing middleware: BaseHTTPMiddleware adds a task and memory stream per request
+class MyMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request:Request,call_next):
+        start_time=time.time()
+        response=await call_next(request)
+        process_time=time.time()-start_time
+        response.headers["X-Process-time"]=str(process_time)
+        return response
+
+
+def blah_app(middleware=None,route_class=None):
+    app=FastAPI()
+    if route_class:
+        app.router.route_class=route_class
+    if middleware:
+        app.add_middleware(middleware)
+
+    @app.get("/blah")
+    async def blah():
+        return {"hello":"world"}
+
+    return app
+
+
+async def drive(app,requests:int,method:str="GET",headers:list[tuple[bytes,bytes]]=()):
+    scope={"type": "http","asgi": {"version": "3.0"},"http_version": "1.1","method": method,"scheme": "http",
+           "path": "/blah","raw_path": b"/blah","root_path": "","query_string": b"","headers": list(headers),
+           "client": ("127.0.0.1",1234),"server": ("bench",80)}
+
+    async def receive():
+        return {"type": "http.request","body": b"","more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(200): # warm up
+        await app(dict(scope),receive,send)
+    start=time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope),receive,send)
+    return (time.perf_counter()-start)/requests
+
+
+def bench_middleware(requests:int=20_000):
+    print(f"GET /blah through the ASGI interface, {requests} requests")
+    baseline=None
+    for name,app in (("no middleware",blah_app()),
+                     ("BaseHTTPMiddleware",blah_app(MyMiddleware)),
+                     ("pure ASGI timing",blah_app(ServerTimingMiddleware,TimedRoute))):
+        elapsed=asyncio.run(drive(app,requests))
+        baseline=baseline or elapsed
+        print(f"  {name:<19} {elapsed*1_000_000:8.2f} us/request   overhead {(elapsed-baseline)*1_000_000:7.2f} us")
+
+
+def bench_metrics_record(requests:int=1_000_000):
+    routes=[("GET","/blah",200,0.0004),("GET","/items/{item_id}",404,0.002),("POST","/items",201,0.03)]
+
+    def loop(record):
+        start=time.perf_counter()
+        for n in range(requests):
+            record(*routes[n%3])
+        return (time.perf_counter()-start)/requests
+
+    empty=loop(lambda method,route,status,seconds: None) # the loop and call overhead, not part of the cost
+    print(f"Metrics.record: {(loop(Metrics().record)-empty)*1e9:7.0f} ns per request")
+
+
+def bench_cors(requests:int=20_000):
+    exact=[f"https://app{n}.example.org" for n in range(450)]
+    wildcards=[f"https://*.tenant{n}.example.net" for n in range(50)]
+    # starlette takes a single regex, so the wildcards are folded into one for it
+    starlette_regex="|".join(rf"https://(?:[a-z0-9-]+\.)+tenant{n}\.example\.net" for n in range(50))
+    apps=(
+        ("starlette CORSMiddleware",blah_app()),
+        ("compiled CORS",blah_app()),
+    )
+    apps[0][1].add_middleware(CORSMiddleware,allow_origins=exact,allow_origin_regex=starlette_regex,max_age=600)
+    apps[1][1].add_middleware(CompiledCORSMiddleware,allow_origins=exact+wildcards,max_age=600)
+
+    print(f"CORS with 500 configured origins, {requests} requests")
+    cases=(
+        ("preflight, exact origin","OPTIONS",[(b"origin",exact[-1].encode()),(b"access-control-request-method",b"GET")]),
+        ("preflight, wildcard origin","OPTIONS",[(b"origin",b"https://eu.tenant49.example.net"),(b"access-control-request-method",b"GET")]),
+        ("GET, exact origin","GET",[(b"origin",exact[-1].encode())]),
+    )
+    for case,method,headers in cases:
+        for name,app in apps:
+            elapsed=asyncio.run(drive(app,requests,method,headers))
+            print(f"  {case:<27} {name:<25} {elapsed*1_000_000:8.2f} us/request")
+
+
+def bench_compression(rounds:int=50):
+    # a /users/ style page: 500 rows of json, about 38KB
+    body=json.dumps([{"id": n,"email": f"user{n}@example.com","is_active": True,"items": []} for n in range(500)]).encode()
+    codings=[("gzip",level) for level in (1,6,9)]+([("br",quality) for quality in (1,4,11)] if brotli else [])
+    print(f"compressing a {len(body)} byte json body, {rounds} rounds")
+    for coding,level in codings:
+        start=time.perf_counter()
+        for _ in range(rounds):
+            compressor=Compressor(coding,level)
+            size=len(compressor.compress(body)+compressor.finish())
+        elapsed=(time.perf_counter()-start)/rounds
+        print(f"  {coding:<4} level {level:<2} {elapsed*1_000_000:8.1f} us   {size:6d} bytes ({size/len(body):.1%})")
+
+
+if __name__ == "__main__":
+    bench_middleware()
+    bench_metrics_record()
+    bench_cors()
+    bench_compression()
@@ -0,0 +1,20 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from cors import CompiledCORSMiddleware
+
+
+@pytest.fixture
+def cors_client():
+    """A client for a one-route app behind CompiledCORSMiddleware configured with the given options."""
+    def build(**options):
+        app=FastAPI()
+        app.add_middleware(CompiledCORSMiddleware,**options)
+
+        @app.get("/items")
+        async def items():
+            return []
+
+        return TestClient(app)
+    return build
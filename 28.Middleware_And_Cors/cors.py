@@ -0,0 +1,123 @@
+import re
+from functools import lru_cache
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp,Message,Receive,Scope,Send
+
+# CORS with every allowed origin compiled once: exact origins go in a set, "https://*.example.com" wildcards and
+# regexes are folded into one alternation. Preflights are answered here, before the rest of the app and routing run.
+
+SAFELISTED_HEADERS={"accept","accept-language","content-language","content-type"}
+WILDCARD_ORIGIN=re.compile(r"([a-z][a-z0-9+.-]*)://\*\.([^*/]+)",re.IGNORECASE) # scheme://*.host[:port]
+
+
+def compile_origins(origins:list[str],origin_regexes:list[str]):
+    exact=set()
+    patterns=list(origin_regexes)
+    for origin in origins:
+        if "*" in origin:
+            # only a leading "*." label is a wildcard, it matches one or more subdomains
+            wildcard=WILDCARD_ORIGIN.fullmatch(origin)
+            if wildcard is None:
+                raise ValueError(f"unsupported wildcard origin {origin!r}, use scheme://*.host")
+            scheme,host=wildcard.groups()
+            patterns.append(re.escape(scheme)+r"://(?:[a-z0-9-]+\.)+"+re.escape(host))
+        else:
+            exact.add(origin.lower())
+    pattern=re.compile("|".join(f"(?:{p})" for p in patterns),re.IGNORECASE) if patterns else None
+
+    @lru_cache(maxsize=4096)
+    def allowed(origin:str) -> bool:
+        return origin.lower() in exact or bool(pattern and pattern.fullmatch(origin))
+
+    return allowed
+
+
+class CompiledCORSMiddleware:
+    def __init__(
+        self,
+        app:ASGIApp,
+        allow_origins:list[str]=(),
+        allow_origin_regexes:list[str]=(),
+        allow_methods:list[str]=("GET",),
+        allow_headers:list[str]=(),
+        allow_credentials:bool=False,
+        expose_headers:list[str]=(),
+        max_age:int=600,
+    ):
+        self.app=app
+        self.allow_all_origins="*" in allow_origins
+        # browsers refuse "*" on a credentialed request, so with credentials every origin is echoed back instead
+        self.allow_any_origin=self.allow_all_origins and not allow_credentials
+        self.allowed=compile_origins([o for o in allow_origins if o != "*"],list(allow_origin_regexes))
+        self.allow_methods={m.upper() for m in allow_methods}
+        self.allow_any_header="*" in allow_headers
+        self.allow_headers={h.lower() for h in allow_headers}|SAFELISTED_HEADERS
+
+        # header lists built once, only the echoed origin (and requested headers) vary per request
+        shared=[(b"vary",b"Origin")]
+        if allow_credentials:
+            shared.append((b"access-control-allow-credentials",b"true"))
+        self.simple_headers=list(shared)
+        if expose_headers:
+            self.simple_headers.append((b"access-control-expose-headers",", ".join(expose_headers).encode()))
+        methods="*" if "*" in self.allow_methods else ", ".join(sorted(self.allow_methods))
+        self.preflight_headers=shared+[
+            (b"access-control-allow-methods",methods.encode()),
+            (b"access-control-max-age",str(max_age).encode()),
+        ]
+        if not self.allow_any_header:
+            self.preflight_headers.append((b"access-control-allow-headers",", ".join(sorted(self.allow_headers)).encode()))
+
+    def origin_allowed(self,origin:str) -> bool:
+        return self.allow_all_origins or self.allowed(origin)
+
+    async def __call__(self,scope:Scope,receive:Receive,send:Send):
+        if scope["type"] != "http":
+            await self.app(scope,receive,send)
+            return
+        headers=Headers(scope=scope)
+        origin=headers.get("origin")
+        if origin is None:
+            await self.app(scope,receive,send)
+            return
+        if scope["method"] == "OPTIONS" and "access-control-request-method" in headers:
+            await self.preflight(origin,headers,send)
+            return
+        if not self.origin_allowed(origin):
+            await self.app(scope,receive,send)
+            return
+
+        allow_origin=b"*" if self.allow_any_origin else origin.encode()
+
+        async def send_with_cors(message:Message):
+            if message["type"] == "http.response.start":
+                message["headers"]=[*message.get("headers",()),(b"access-control-allow-origin",allow_origin),*self.simple_headers]
+            await send(message)
+
+        await self.app(scope,receive,send_with_cors)
+
+    async def preflight(self,origin:str,headers:Headers,send:Send):
+        failures=[]
+        if not self.origin_allowed(origin):
+            failures.append("origin")
+        if "*" not in self.allow_methods and headers["access-control-request-method"].upper() not in self.allow_methods:
+            failures.append("method")
+        requested=headers.get("access-control-request-headers","")
+        if not self.allow_any_header:
+            if any(h.strip().lower() not in self.allow_headers for h in requested.split(",") if h.strip()):
+                failures.append("headers")
+
+        if failures:
+            body=("Disallowed CORS "+", ".join(failures)).encode()
+            response_headers=[(b"content-type",b"text/plain; charset=utf-8"),(b"content-length",str(len(body)).encode())]
+            status=400
+        else:
+            body=b""
+            response_headers=[(b"access-control-allow-origin",b"*" if self.allow_any_origin else origin.encode()),
+                              *self.preflight_headers,(b"content-length",b"0")]
+            if self.allow_any_header and requested:
+                response_headers.append((b"access-control-allow-headers",requested.encode()))
+            status=200
+        await send({"type": "http.response.start","status": status,"headers": response_headers})
+        await send({"type": "http.response.body","body": body})
@@ -1,28 +1,25 @@
-from fastapi import FastAPI,Request
+from fastapi import FastAPI
 from pydantic import BaseModel
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi.middleware.cors import CORSMiddleware
-import time
+from compression import CompressionMiddleware
+from cors import CompiledCORSMiddleware
+from metrics import install_metrics
+from timing import ServerTimingMiddleware,TimedRoute
 
 
 app=FastAPI()
+app.router.route_class=TimedRoute # marks the phases ServerTimingMiddleware reports
 
 
-class MyMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request:Request,call_next):
-        start_time=time.time()
-        response=await call_next(request)
-        process_time=time.time()-start_time
-        response.headers["X-Process-time"]=str(process_time)
-        return response
-    
-
 origins=["https://localhost:8000","http://localhost:3000"]
 
-app.add_middleware(MyMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+install_metrics(app) # per-route counters and latency histograms at /metrics
+app.add_middleware(CompressionMiddleware) # adds its own compress entry to Server-Timing
+# added last so it is the outermost middleware and preflights never reach timing, metrics or routing
 app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,)
+    CompiledCORSMiddleware,
+    allow_origins=origins,
+    max_age=600,)
 
 @app.get("/blah")
 async def blah():
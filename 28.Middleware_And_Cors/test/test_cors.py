@@ -0,0 +1,32 @@
+import pytest
+
+from cors import compile_origins
+
+
+def test_any_origin_without_credentials_gets_a_star(cors_client):
+    client=cors_client(allow_origins=["*"])
+    response=client.get("/items",headers={"Origin": "https://app.example.com"})
+    assert response.headers["access-control-allow-origin"] == "*"
+
+def test_any_origin_with_credentials_is_echoed(cors_client):
+    client=cors_client(allow_origins=["*"],allow_credentials=True,allow_methods=["GET","POST"])
+    response=client.get("/items",headers={"Origin": "https://app.example.com"})
+    assert response.headers["access-control-allow-origin"] == "https://app.example.com"
+    assert response.headers["access-control-allow-credentials"] == "true"
+    preflight=client.options("/items",headers={"Origin": "https://other.example.org","Access-Control-Request-Method": "POST"})
+    assert preflight.status_code == 200
+    assert preflight.headers["access-control-allow-origin"] == "https://other.example.org"
+
+def test_listed_and_wildcard_origins(cors_client):
+    client=cors_client(allow_origins=["https://example.com","https://*.example.com"])
+    for origin in ("https://example.com","https://a.example.com","https://a.b.example.com"):
+        assert client.get("/items",headers={"Origin": origin}).headers["access-control-allow-origin"] == origin
+    for origin in ("https://evil.com","https://a.example.com.evil.com","http://a.example.com"):
+        assert "access-control-allow-origin" not in client.get("/items",headers={"Origin": origin}).headers
+    preflight=client.options("/items",headers={"Origin": "https://evil.com","Access-Control-Request-Method": "GET"})
+    assert preflight.status_code == 400
+
+@pytest.mark.parametrize("origin",["https://*example.com","*.example.com","https://a.*.example.com","https://example.*"])
+def test_unsupported_wildcards_are_rejected(origin):
+    with pytest.raises(ValueError):
+        compile_origins([origin],[])
@@ -0,0 +1,45 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from timing import ServerTimingMiddleware,TimedRoute
+
+
+def timed_client() -> tuple[TestClient,dict]:
+    app=FastAPI()
+    app.router.route_class=TimedRoute
+    app.add_middleware(ServerTimingMiddleware)
+    loops={} # whether each endpoint ran on the event loop thread
+
+    def on_loop() -> bool:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    @app.get("/async")
+    async def in_loop():
+        loops["async"]=on_loop()
+        return {}
+
+    @app.get("/sync")
+    def in_threadpool():
+        loops["sync"]=on_loop()
+        return {}
+
+    return TestClient(app),loops
+
+
+def test_server_timing_reports_every_phase():
+    client,_=timed_client()
+    for path in ("/async","/sync"):
+        timing=client.get(path).headers["server-timing"]
+        assert [entry.split(";")[0] for entry in timing.split(", ")] == ["routing","deps","endpoint","serialize","total"]
+
+def test_sync_endpoints_still_run_in_the_threadpool():
+    client,loops=timed_client()
+    client.get("/async")
+    client.get("/sync")
+    assert loops == {"async": True,"sync": False}
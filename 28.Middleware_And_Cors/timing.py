@@ -0,0 +1,98 @@
+import functools
+import inspect
+from contextvars import ContextVar
+from time import perf_counter_ns
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp,Message,Receive,Scope,Send
+
+# per-request phase timings, reported in a Server-Timing header:
+#   routing    middleware entry -> route handler (middleware stack and path matching)
+#   deps       route handler -> endpoint call (request parsing and dependency resolution)
+#   endpoint   the endpoint function itself
+#   serialize  endpoint return -> response start (response_model validation and json encoding)
+
+timing_marks:ContextVar[dict[str,int]|None]=ContextVar("timing_marks",default=None)
+
+
+def mark(name:str):
+    marks=timing_marks.get()
+    if marks is not None:
+        marks[name]=perf_counter_ns()
+
+
+def timed_endpoint(endpoint):
+    # sync endpoints must stay sync so fastapi still runs them in the threadpool, the context var follows them there
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args,**kwargs):
+            mark("endpoint_start")
+            try:
+                return await endpoint(*args,**kwargs)
+            finally:
+                mark("endpoint_end")
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args,**kwargs):
+            mark("endpoint_start")
+            try:
+                return endpoint(*args,**kwargs)
+            finally:
+                mark("endpoint_end")
+    return timed
+
+
+class TimedRoute(APIRoute):
+    """Route class that marks the phase boundaries, use it with app.router.route_class=TimedRoute."""
+
+    def __init__(self,path:str,endpoint,**kwargs):
+        super().__init__(path,timed_endpoint(endpoint),**kwargs)
+
+    def get_route_handler(self):
+        handler=super().get_route_handler()
+
+        async def timed_handler(request):
+            mark("handler")
+            return await handler(request)
+
+        return timed_handler
+
+
+PHASES=(("routing","start","handler"),("deps","handler","endpoint_start"),("endpoint","endpoint_start","endpoint_end"),("serialize","endpoint_end","response"))
+
+
+def server_timing(marks:dict[str,int]) -> str:
+    metrics=[]
+    for name,begin,end in PHASES:
+        if begin in marks and end in marks:
+            metrics.append(f"{name};dur={(marks[end]-marks[begin])/1e6:.3f}")
+    metrics.append(f"total;dur={(marks['response']-marks['start'])/1e6:.3f}")
+    return ", ".join(metrics)
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI timing middleware, no extra task or memory stream per request and streaming bodies pass straight through."""
+
+    def __init__(self,app:ASGIApp):
+        self.app=app
+
+    async def __call__(self,scope:Scope,receive:Receive,send:Send):
+        if scope["type"] != "http":
+            await self.app(scope,receive,send)
+            return
+        marks={"start": perf_counter_ns()}
+        reset=timing_marks.set(marks)
+
+        async def send_with_timing(message:Message):
+            if message["type"] == "http.response.start":
+                marks["response"]=perf_counter_ns()
+                headers=MutableHeaders(scope=message)
+                headers.append("Server-Timing",server_timing(marks))
+                headers.append("X-Process-time",str((marks["response"]-marks["start"])/1e9))
+            await send(message)
+
+        try:
+            await self.app(scope,receive,send_with_timing)
+        finally:
+            timing_marks.reset(reset)
@@ -0,0 +1,103 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from . import schemas
+
+# read-through cache for user lookups, values are validated schemas.User snapshots so they can be shared across sessions
+
+
+class CacheBackend:
+    """Where cached values live. Subclass it to move the cache out of process (e.g. to a shared store)."""
+
+    def get(self,key:str):
+        raise NotImplementedError
+
+    def set(self,key:str,value):
+        raise NotImplementedError
+
+    def delete(self,*keys:str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryCache(CacheBackend):
+    """Bounded in-process LRU, entries older than ttl seconds count as misses."""
+
+    def __init__(self,maxsize:int=1024,ttl:float=60.0):
+        self.maxsize=maxsize
+        self.ttl=ttl
+        self._entries:OrderedDict[str,tuple[float,object]]=OrderedDict()
+        self._lock=Lock()
+        self.hits=self.misses=self.evictions=0
+
+    def get(self,key:str):
+        with self._lock:
+            entry=self._entries.get(key)
+            if entry is None:
+                self.misses+=1
+                return None
+            expires,value=entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.evictions+=1
+                self.misses+=1
+                return None
+            self._entries.move_to_end(key)
+            self.hits+=1
+            return value
+
+    def set(self,key:str,value):
+        with self._lock:
+            self._entries[key]=(time.monotonic()+self.ttl,value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions+=1
+
+    def delete(self,*keys:str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key,None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return dict(hits=self.hits,misses=self.misses,evictions=self.evictions,size=len(self._entries),maxsize=self.maxsize)
+
+
+class UserCache:
+    """Users keyed by id, plus an email -> id pointer so both lookups share one entry."""
+
+    def __init__(self,backend:CacheBackend):
+        self.backend=backend
+
+    def get(self,user_id:int) -> schemas.User|None:
+        return self.backend.get(f"user:id:{user_id}")
+
+    def get_by_email(self,email:str) -> schemas.User|None:
+        user_id=self.backend.get(f"user:email:{email}")
+        return None if user_id is None else self.get(user_id)
+
+    def put(self,db_user) -> schemas.User:
+        user=db_user if isinstance(db_user,schemas.User) else schemas.User.model_validate(db_user,from_attributes=True)
+        self.backend.set(f"user:id:{user.id}",user)
+        self.backend.set(f"user:email:{user.email}",user.id)
+        return user
+
+    def invalidate(self,user_id:int):
+        # the email pointer is left behind on purpose, it dereferences to a miss once the id entry is gone
+        self.backend.delete(f"user:id:{user_id}")
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+
+user_cache=UserCache(MemoryCache(maxsize=1024,ttl=60.0))
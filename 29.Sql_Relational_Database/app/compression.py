@@ -0,0 +1,121 @@
+import zlib
+from time import thread_time_ns
+
+from starlette.datastructures import Headers,MutableHeaders
+from starlette.types import ASGIApp,Message,Receive,Scope,Send
+
+try:
+    import brotli
+except ImportError: # optional, without it only gzip is offered
+    brotli=None
+
+# response compression negotiated from Accept-Encoding. Whole bodies are compressed in one go and report
+# `compress;dur=<cpu ms>;desc="gzip 12034->1711"` in Server-Timing, streamed bodies are compressed chunk by chunk.
+
+INCOMPRESSIBLE_TYPES=("image/","video/","audio/","font/woff","application/zip","application/gzip","application/x-brotli","application/octet-stream")
+
+
+def compression_level(level:int):
+    """Per-route level for the endpoint it decorates, 0 turns compression off for that route."""
+    def decorate(endpoint):
+        endpoint.compression_level=level
+        return endpoint
+    return decorate
+
+
+def negotiate(accept_encoding:str) -> str|None:
+    accepted={}
+    for part in accept_encoding.split(","):
+        coding,_,params=part.strip().partition(";")
+        q=1.0
+        if params.strip().startswith("q="):
+            try:
+                q=float(params.strip()[2:])
+            except ValueError:
+                q=0.0
+        accepted[coding.strip().lower()]=q
+    wildcard=accepted.get("*",0.0)
+    for coding in (("br","gzip") if brotli else ("gzip",)):
+        if accepted.get(coding,wildcard) > 0:
+            return coding
+    return None
+
+
+class Compressor:
+    def __init__(self,coding:str,level:int):
+        if coding == "br":
+            compressor=brotli.Compressor(quality=min(level,11))
+            self.compress,self.flush,self.finish=compressor.process,compressor.flush,compressor.finish
+        else:
+            # gzip framing, wbits 16+ makes zlib write the header and trailer
+            compressor=zlib.compressobj(min(level,9),zlib.DEFLATED,16+zlib.MAX_WBITS)
+            self.compress,self.finish=compressor.compress,compressor.flush
+            self.flush=lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def chunk(self,data:bytes) -> bytes:
+        return self.compress(data)+self.flush() # push it out now, streams should not stall in the buffer
+
+
+class CompressionMiddleware:
+    def __init__(self,app:ASGIApp,minimum_size:int=1024,gzip_level:int=6,brotli_quality:int=4):
+        self.app=app
+        self.minimum_size=minimum_size
+        self.levels={"gzip": gzip_level,"br": brotli_quality}
+
+    async def __call__(self,scope:Scope,receive:Receive,send:Send):
+        if scope["type"] != "http":
+            await self.app(scope,receive,send)
+            return
+        coding=negotiate(Headers(scope=scope).get("accept-encoding",""))
+        if coding is None:
+            await self.app(scope,receive,send)
+            return
+
+        start_message:Message|None=None
+        compressor:Compressor|None=None
+        passthrough=False
+
+        async def send_compressed(message:Message):
+            nonlocal start_message,compressor,passthrough
+            if message["type"] == "http.response.start":
+                start_message=message # held back until the first body chunk shows whether compressing pays off
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            body=message.get("body",b"")
+            more_body=message.get("more_body",False)
+
+            if compressor is None:
+                headers=MutableHeaders(scope=start_message)
+                endpoint=getattr(scope.get("route"),"endpoint",None)
+                level=getattr(endpoint,"compression_level",self.levels[coding])
+                content_type=headers.get("content-type","")
+                if (not level or "content-encoding" in headers or content_type.startswith(INCOMPRESSIBLE_TYPES)
+                        or (not more_body and len(body) < self.minimum_size)):
+                    passthrough=True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor=Compressor(coding,level)
+                headers["Content-Encoding"]=coding
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body:
+                    # the whole body is here, so the cost and the saving can go out with the headers
+                    cpu=thread_time_ns()
+                    compressed=compressor.compress(body)+compressor.finish()
+                    cpu=thread_time_ns()-cpu
+                    headers["Content-Length"]=str(len(compressed))
+                    headers.append("Server-Timing",f'compress;dur={cpu/1e6:.3f};desc="{coding} {len(body)}->{len(compressed)}"')
+                    await send(start_message)
+                    await send({"type": "http.response.body","body": compressed})
+                    return
+                del headers["Content-Length"]
+                await send(start_message)
+
+            data=compressor.chunk(body)
+            if not more_body:
+                data+=compressor.finish()
+            await send({"type": "http.response.body","body": data,"more_body": more_body})
+
+        await self.app(scope,receive,send_compressed)
@@ -1,30 +1,149 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import and_,column,insert,literal_column,or_,select,table
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload,raiseload,selectinload
 from . import models,schemas
+from .cache import user_cache
+from .database import RoutingSession
 
-def get_user(db:Session,user_id:int):
-    return db.query(models.User).filter(models.User.id == user_id).first() # will use the f
+# AsyncSession cannot lazy load while the response is serialized, so each endpoint picks how User.items is loaded:
+# "selectin" adds one IN query for the whole page, "joined" folds them into the user query, None leaves them unloaded
+ITEM_LOADERS={"selectin": selectinload,"joined": joinedload}
 
-def get_user_by_email(db:Session, email:str):
-    return db.query(models.User).filter(models.User.email == email).first()
+def load_items(query,items:str|None):
+    if items is None:
+        return query.options(raiseload(models.User.items)) # touching items now raises instead of issuing a query per user
+    return query.options(ITEM_LOADERS[items](models.User.items))
 
-def get_users(db:Session,skip:int=0,limit:int=100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def remember(db:AsyncSession,db_user,items:str|None):
+    # only rows loaded with their items are complete enough to cache, and not while the replica lags behind a write
+    if db_user is None or items is None:
+        return db_user
+    if isinstance(db.sync_session,RoutingSession) and not db.sync_session.fresh():
+        return db_user
+    return user_cache.put(db_user)
 
-def create_user(db:Session, user: schemas.UserCreate):
+async def get_user(db:AsyncSession,user_id:int,items:str|None="joined"):
+    cached=user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    result=await db.execute(load_items(select(models.User),items).filter(models.User.id == user_id))
+    return remember(db,result.unique().scalars().first(),items)
+
+async def get_user_by_email(db:AsyncSession, email:str,items:str|None=None):
+    cached=user_cache.get_by_email(email)
+    if cached is not None:
+        return cached
+    result=await db.execute(load_items(select(models.User),items).filter(models.User.email == email))
+    return remember(db,result.unique().scalars().first(),items)
+
+def paginate(query,column,skip:int,limit:int,after_id:int|None):
+    # seek past the cursor on the primary key index instead of scanning and dropping skip rows
+    query=query.order_by(column).limit(limit)
+    if after_id is not None:
+        return query.filter(column > after_id)
+    return query.offset(skip)
+
+async def get_users(db:AsyncSession,skip:int=0,limit:int=100,after_id:int|None=None,items:str|None="selectin"):
+    result=await db.execute(paginate(load_items(select(models.User),items),models.User.id,skip,limit,after_id))
+    return result.unique().scalars().all()
+
+async def create_user(db:AsyncSession, user: schemas.UserCreate):
+    # no existence check first, the unique email index rejects duplicates with an IntegrityError (even for concurrent signups)
     fake_hashed_passsword = user.password+"nothashed"
-    db_user=models.User(email=user.email,hashed_password=fake_hashed_passsword)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    statement=insert(models.User).values(email=user.email,hashed_password=fake_hashed_passsword,is_active=True)
+    try:
+        if db.bind.dialect.insert_returning:
+            user_id=(await db.execute(statement.returning(models.User.id))).scalar_one()
+        else:
+            user_id=(await db.execute(statement)).inserted_primary_key[0]
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise
+    db_user=schemas.User(id=user_id,email=user.email,is_active=True,items=[]) # a new user has no items yet
+    user_cache.put(db_user)
     return db_user
 
+async def create_users(db:AsyncSession, users:list[schemas.UserCreate]):
+    # one multi-row INSERT in one transaction, rows whose email is taken are skipped by the unique index instead of failing the batch
+    if not users:
+        return schemas.BulkResult()
+    rows=[dict(email=user.email,hashed_password=user.password+"nothashed",is_active=True) for user in users]
+    statement=sqlite_insert(models.User).on_conflict_do_nothing(index_elements=["email"]).returning(models.User.id,models.User.email)
+    inserted={email: user_id for user_id,email in await db.execute(statement,rows)}
+    await db.commit()
 
-def get_items(db:Session,skip:int=0,limit:int=100):
-    return db.query(models.Item).offset(skip).limit(limit).all()
+    bulk=schemas.BulkResult()
+    for index,user in enumerate(users):
+        if user.email in inserted:
+            bulk.created.append(schemas.BulkCreated(index=index,id=inserted.pop(user.email)))
+        else:
+            bulk.errors.append(schemas.BulkError(index=index,detail="Email already registered"))
+    return bulk
 
-def create_user_item(db:Session,item:schemas.ItemCreate,user_id:int):
+
+async def get_items(db:AsyncSession,skip:int=0,limit:int=100,after_id:int|None=None):
+    result=await db.execute(paginate(select(models.Item),models.Item.id,skip,limit,after_id))
+    return result.scalars().all()
+
+async def get_user_items(db:AsyncSession,user_id:int,limit:int=100,after_id:int|None=None):
+    # walks ix_items_owner_id_id, never the whole items table
+    query=select(models.Item).filter(models.Item.owner_id == user_id)
+    result=await db.execute(paginate(query,models.Item.id,0,limit,after_id))
+    return result.scalars().all()
+
+async def create_user_item(db:AsyncSession,item:schemas.ItemCreate,user_id:int):
     db_items=models.Item(**item.model_dump(),owner_id=user_id)
     db.add(db_items)
-    db.commit()
-    db.refresh(db_items)
-    return db_items
\ No newline at end of file
+    await db.commit()
+    await db.refresh(db_items)
+    user_cache.invalidate(user_id)
+    return db_items
+
+
+async def create_user_items(db:AsyncSession,items:list[schemas.ItemCreate],user_id:int):
+    if not items:
+        return schemas.BulkResult()
+    rows=[dict(**item.model_dump(),owner_id=user_id) for item in items]
+    statement=insert(models.Item).returning(models.Item.id,sort_by_parameter_order=True)
+    ids=(await db.execute(statement,rows)).scalars().all()
+    await db.commit()
+    user_cache.invalidate(user_id)
+    return schemas.BulkResult(created=[schemas.BulkCreated(index=index,id=item_id) for index,item_id in enumerate(ids)])
+
+
+items_fts=table("items_fts",column("rowid"),column("rank"))
+
+def match_terms(q:str) -> str:
+    # every word as a quoted phrase, so user input can never be parsed as fts5 query syntax
+    return " ".join('"'+word.replace('"','""')+'"' for word in q.split())
+
+async def search_items(db:AsyncSession,q:str,limit:int=100,after:tuple[float,int]|None=None):
+    # best matches first (bm25, lower is better), keyset on (rank, id) so pages stay cheap
+    rank=items_fts.c.rank
+    query=(
+        select(models.Item.id,models.Item.title,models.Item.description,models.Item.owner_id,rank.label("rank"))
+        .join_from(items_fts,models.Item,models.Item.id == items_fts.c.rowid)
+        .filter(literal_column("items_fts").match(match_terms(q)))
+        .order_by(rank,models.Item.id)
+        .limit(limit)
+    )
+    if after is not None:
+        after_rank,after_id=after
+        query=query.filter(or_(rank > after_rank,and_(rank == after_rank,models.Item.id > after_id)))
+    return (await db.execute(query)).all()
+
+async def stream_users(db:AsyncSession,is_active:bool|None=None,batch:int=1000):
+    # plain columns instead of User entities, nothing is added to the identity map while streaming
+    query=select(models.User.id,models.User.email,models.User.is_active).order_by(models.User.id)
+    if is_active is not None:
+        query=query.filter(models.User.is_active == is_active)
+    return await db.stream(query.execution_options(yield_per=batch))
+
+async def stream_items(db:AsyncSession,owner_id:int|None=None,batch:int=1000):
+    query=select(models.Item.id,models.Item.title,models.Item.description,models.Item.owner_id).order_by(models.Item.id)
+    if owner_id is not None:
+        query=query.filter(models.Item.owner_id == owner_id)
+    return await db.stream(query.execution_options(yield_per=batch))
@@ -1,8 +1,20 @@
-from sqlalchemy import create_engine
+import asyncio
+import logging
+
+from sqlalchemy import Delete,Insert,Update,create_engine,event
+from sqlalchemy.ext.asyncio import async_sessionmaker,create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session,sessionmaker
+
+logger=logging.getLogger(__name__)
 
 SQLALCHEMY_DATABASE_URL="sqlite:///./sql_app.db"
+ASYNC_SQLALCHEMY_DATABASE_URL="sqlite+aiosqlite:///./sql_app.db"
+
+# stand-in read replica for local runs, a second sqlite file refreshed from the primary with the backup api
+REPLICA_DATABASE_URL="sqlite:///./sql_app_replica.db"
+ASYNC_REPLICA_DATABASE_URL="sqlite+aiosqlite:///./sql_app_replica.db"
+REPLICA_SYNC_SECONDS=1.0
 
 #sql
 
@@ -14,8 +26,88 @@ engine=create_engine(
 
 SessionLocal=sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# async engine for the request path, aiosqlite runs the sqlite calls off the event loop
+async_engine=create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+
+AsyncSessionLocal=async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+replica_engine=create_engine(REPLICA_DATABASE_URL,connect_args={"check_same_thread": False})
+async_replica_engine=create_async_engine(ASYNC_REPLICA_DATABASE_URL)
+
+
+class ReplicaSync:
+    """Copies the primary into the replica file whenever a commit has landed since the last copy."""
+
+    def __init__(self,primary,replica,writers:list):
+        self.primary=primary
+        self.replica=replica
+        self.generation=0 # bumped by every commit to the primary
+        self.synced=-1 # the generation the replica was last copied at
+        for writer in writers: # every engine that commits to the primary file
+            event.listen(writer,"commit",self.committed)
+        # engine commit events fire just before the commit reaches the file, bump once more after it so a copy
+        # taken in between is not the last one
+        event.listen(Session,"after_commit",self.committed)
+
+    def committed(self,*args):
+        self.generation+=1
+
+    @property
+    def stale(self) -> bool:
+        return self.synced != self.generation
+
+    def copy(self):
+        generation=self.generation
+        with self.primary.connect() as source,self.replica.connect() as target:
+            source.connection.driver_connection.backup(target.connection.driver_connection)
+        self.synced=generation # a commit during the copy moved generation on, so the replica stays stale
+
+    async def run(self,interval:float=REPLICA_SYNC_SECONDS):
+        while True:
+            if self.stale:
+                try:
+                    await asyncio.to_thread(self.copy)
+                except Exception: # reads stay on the primary meanwhile, try again on the next tick
+                    logger.exception("copying the primary to the replica failed")
+            await asyncio.sleep(interval)
+
+replica_sync=ReplicaSync(primary=engine,replica=replica_engine,writers=[engine,async_engine.sync_engine])
+
+
+class RoutingSession(Session):
+    """Reads go to the replica only while it has every commit, once the session writes or sees the replica behind
+    everything sticks to the primary, so reads never miss a write that was already acknowledged."""
+
+    def __init__(self,primary,replica,replica_sync:ReplicaSync,**kw):
+        super().__init__(**kw)
+        self.primary=primary
+        self.replica=replica
+        self.replica_sync=replica_sync
+
+    def fresh(self) -> bool:
+        """False while this session reads from a replica that is missing commits."""
+        return self.info.get("primary",False) or not self.replica_sync.stale
+
+    def get_bind(self,mapper=None,clause=None,**kw):
+        if self._flushing or isinstance(clause,(Insert,Update,Delete)) or self.replica_sync.stale:
+            self.info["primary"]=True # read-your-writes, the replica may not have this row yet
+        if self.info.get("primary"):
+            return self.primary
+        return self.replica
+
+ReadSessionLocal=async_sessionmaker(
+    sync_session_class=RoutingSession,
+    primary=async_engine.sync_engine,
+    replica=async_replica_engine.sync_engine,
+    replica_sync=replica_sync,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 Base=declarative_base()
 
 # The engine manages database connections.
 # The session handles interactions with the database.
-# The Base class acts as a blueprint for creating database tables.
\ No newline at end of file
+# The async engine and AsyncSessionLocal do the same without blocking the event loop.
+# ReadSessionLocal serves read-only routes from the replica and ReplicaSync keeps that replica fresh.
+# The Base class acts as a blueprint for creating database tables.
@@ -0,0 +1,38 @@
+import csv
+import io
+import json
+from enum import Enum
+
+from fastapi.responses import StreamingResponse
+
+# full-table exports, rows go out one yield_per partition at a time so memory stays flat whatever the table size
+
+EXPORT_BATCH=1000
+
+class ExportFormat(Enum):
+    NDJSON = 'ndjson'
+    CSV = 'csv'
+
+MEDIA_TYPES={ExportFormat.NDJSON: "application/x-ndjson",ExportFormat.CSV: "text/csv"}
+
+
+async def ndjson_lines(result):
+    async for partition in result.mappings().partitions():
+        yield "".join(json.dumps(dict(row))+"\n" for row in partition)
+
+async def csv_lines(result):
+    buffer=io.StringIO()
+    writer=csv.writer(buffer)
+    writer.writerow(result.keys())
+    async for partition in result.partitions():
+        writer.writerows(partition)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell(): # header only, the table was empty
+        yield buffer.getvalue()
+
+def export_response(result,format:ExportFormat,name:str):
+    lines=ndjson_lines(result) if format == ExportFormat.NDJSON else csv_lines(result)
+    headers={"Content-Disposition": f'attachment; filename="{name}.{format.value}"'}
+    return StreamingResponse(lines,media_type=MEDIA_TYPES[format],headers=headers)
@@ -1,8 +1,17 @@
-from fastapi import Depends,HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import Depends,HTTPException,Query,Response
 from fastapi import FastAPI
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from .import crud,models,schemas
-from .database import SessionLocal,engine
+from .cache import user_cache
+from .compression import CompressionMiddleware,compression_level
+from .export import EXPORT_BATCH,ExportFormat,export_response
+from .metrics import install_metrics
+from .pagination import decode_cursor,decode_rank_cursor,set_next_cursor
+from .database import AsyncSessionLocal,ReadSessionLocal,engine,replica_sync
 
 models.Base.metadata.create_all(bind=engine) # use alembic instead of this
 """
@@ -10,40 +19,96 @@ The statement models.Base.metadata.create_all(bind=engine) tells SQLAlchemy to c
 It uses the metadata collected from the models and binds the operation to the specified database engine. 
 This ensures the database schema is in sync with your model definitions.
 """
-app=FastAPI()
 
-def get_db():
-    db=SessionLocal()
-    try:
+@asynccontextmanager
+async def lifespan(app:FastAPI):
+    await asyncio.to_thread(replica_sync.copy) # the replica starts out as a full copy of the primary
+    syncing=asyncio.create_task(replica_sync.run())
+    yield
+    syncing.cancel()
+
+app=FastAPI(lifespan=lifespan)
+install_metrics(app)
+app.add_middleware(CompressionMiddleware) # gzip (or brotli when installed) for bodies over 1KB
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db():
+    # read-only routes, served by the replica while it is in sync and by the primary otherwise
+    async with ReadSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 @app.post("/users/",response_model=schemas.User)
-def create_user(user:schemas.UserCreate, db:Session=Depends(get_db)):
-    db_user=crud.get_user_by_email(db,user.email)
-    if db_user:
+async def create_user(user:schemas.UserCreate, db:AsyncSession=Depends(get_db)):
+    try:
+        return await crud.create_user(db,user=user)
+    except IntegrityError:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db,user=user)
+
+@app.post("/users/bulk",response_model=schemas.BulkResult)
+async def create_users(users:list[schemas.UserCreate], db:AsyncSession=Depends(get_db)):
+    return await crud.create_users(db,users=users)
 
 @app.get("/users/",response_model=list[schemas.User])
-def read_users(skip:int=0, limit:int=100, db:Session=Depends(get_db)):
-    users=crud.get_users(db,skip=skip,limit=limit)
+async def read_users(response:Response, skip:int=0, limit:int=100, cursor:str|None=None, db:AsyncSession=Depends(get_read_db)):
+    users=await crud.get_users(db,skip=skip,limit=limit,after_id=decode_cursor(cursor),items="selectin")
+    set_next_cursor(response,users,limit) # pass it back as ?cursor= for the next page, skip is ignored then
     return users
 
+@app.get("/users/export")
+@compression_level(1) # exports are long streams, cheap compression keeps up with the database
+async def export_users(format:ExportFormat=ExportFormat.NDJSON, is_active:bool|None=None, db:AsyncSession=Depends(get_db)):
+    result=await crud.stream_users(db,is_active=is_active,batch=EXPORT_BATCH)
+    return export_response(result,format,"users")
+
 @app.get("/users/{user_id}",response_model=schemas.User)
-def read_user(user_id:int, db:Session=Depends(get_db)):
-    db_user=crud.get_user(db,user_id=user_id)
+async def read_user(user_id:int, db:AsyncSession=Depends(get_read_db)):
+    db_user=await crud.get_user(db,user_id=user_id,items="joined")
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 
 @app.post("/users/{user_id}/items/",response_model=schemas.Item)
-def create_user_item(item:schemas.ItemCreate, user_id:int, db:Session=Depends(get_db)):
-    return crud.create_user_item(db, item=item, user_id=user_id)
+async def create_user_item(item:schemas.ItemCreate, user_id:int, db:AsyncSession=Depends(get_db)):
+    return await crud.create_user_item(db, item=item, user_id=user_id)
+
+@app.get("/users/{user_id}/items/",response_model=list[schemas.Item])
+async def read_user_items(user_id:int, response:Response, limit:int=100, cursor:str|None=None, db:AsyncSession=Depends(get_read_db)):
+    items=await crud.get_user_items(db,user_id=user_id,limit=limit,after_id=decode_cursor(cursor))
+    if not items and await crud.get_user(db,user_id=user_id,items=None) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    set_next_cursor(response,items,limit)
+    return items
+
+@app.post("/users/{user_id}/items/bulk",response_model=schemas.BulkResult)
+async def create_user_items(items:list[schemas.ItemCreate], user_id:int, db:AsyncSession=Depends(get_db)):
+    if await crud.get_user(db,user_id=user_id,items=None) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return await crud.create_user_items(db, items=items, user_id=user_id)
 
 @app.get("/items/",response_model=list[schemas.Item])
-def read_items(skip:int=0, limit:int=100, db:Session=Depends(get_db)):
-    items=crud.get_items(db,skip=skip, limit=limit)
+async def read_items(response:Response, skip:int=0, limit:int=100, cursor:str|None=None, db:AsyncSession=Depends(get_read_db)):
+    items=await crud.get_items(db,skip=skip, limit=limit,after_id=decode_cursor(cursor))
+    set_next_cursor(response,items,limit)
     return items
+
+@app.get("/items/search",response_model=list[schemas.Item])
+async def search_items(response:Response, q:str=Query(min_length=1), limit:int=100, cursor:str|None=None, db:AsyncSession=Depends(get_read_db)):
+    if not q.split():
+        return []
+    items=await crud.search_items(db,q=q,limit=limit,after=decode_rank_cursor(cursor))
+    set_next_cursor(response,items,limit,ranked=True)
+    return items
+
+@app.get("/items/export")
+@compression_level(1)
+async def export_items(format:ExportFormat=ExportFormat.NDJSON, owner_id:int|None=None, db:AsyncSession=Depends(get_db)):
+    result=await crud.stream_items(db,owner_id=owner_id,batch=EXPORT_BATCH)
+    return export_response(result,format,"items")
+
+@app.get("/cache/stats")
+async def read_cache_stats():
+    return user_cache.stats()
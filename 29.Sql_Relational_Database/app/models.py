@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean,Column,ForeignKey,Integer,String
+from sqlalchemy import Boolean,Column,ForeignKey,Index,Integer,String,event
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -20,4 +20,31 @@ class Item(Base):
     owner_id=Column(Integer,ForeignKey("users.id"))
     owner=relationship("User",back_populates="items")
 
+    # one user's items in id order, also serves plain owner_id lookups as its leftmost column
+    __table_args__=(Index("ix_items_owner_id_id","owner_id","id"),)
 
+
+# full-text index over items, an external-content fts5 table that triggers keep in step with every insert, update and delete
+ITEM_SEARCH_DDL=[
+    "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(title, description, content='items', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO items_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+@event.listens_for(Base.metadata,"after_create")
+def create_item_search(target,connection,**kw):
+    existed=connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name='items_fts'").first()
+    for statement in ITEM_SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+    if not existed: # index the items that were there before search was added
+        connection.exec_driver_sql("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+    for index in Item.__table__.indexes: # create_all skips indexes added to tables that already exist
+        index.create(connection,checkfirst=True)
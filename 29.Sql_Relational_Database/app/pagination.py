@@ -0,0 +1,44 @@
+import base64
+
+from fastapi import HTTPException,Response
+
+# cursors are opaque to clients, they only carry the sort key of the last row of the previous page:
+# its id, or its search rank and id for ranked results
+
+
+def encode_cursor(last_id:int,rank:float|None=None) -> str:
+    payload=f"id:{last_id}" if rank is None else f"rank:{rank!r}:{last_id}"
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def cursor_values(cursor:str,kind:str) -> list[str]:
+    try:
+        found,*values=base64.urlsafe_b64decode(cursor+"="*(-len(cursor)%4)).decode().split(":")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if found != kind:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def decode_cursor(cursor:str|None) -> int|None:
+    if cursor is None:
+        return None
+    try:
+        (value,)=cursor_values(cursor,"id")
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def decode_rank_cursor(cursor:str|None) -> tuple[float,int]|None:
+    if cursor is None:
+        return None
+    try:
+        rank,last_id=cursor_values(cursor,"rank")
+        return float(rank),int(last_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def set_next_cursor(response:Response,rows:list,limit:int,ranked:bool=False):
+    # a short page means there is nothing after it
+    if rows and len(rows) == limit:
+        last=rows[-1]
+        response.headers["X-Next-Cursor"]=encode_cursor(last.id,last.rank if ranked else None)
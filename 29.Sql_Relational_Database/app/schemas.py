@@ -30,3 +30,16 @@ class User(UserBase):
     class Config:
         orm_mode=True # it allows us to treat like a.key_a instead of data["Key_a"]
 
+
+
+class BulkCreated(BaseModel):
+    index:int # position of the row in the request array
+    id:int
+
+class BulkError(BaseModel):
+    index:int
+    detail:str
+
+class BulkResult(BaseModel):
+    created:list[BulkCreated] = []
+    errors:list[BulkError] = []
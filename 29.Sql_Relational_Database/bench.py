@@ -0,0 +1,203 @@
+"""
+Benchmarks for the sql app, run from this folder with: python bench.py
+
+Every benchmark works on its own throwaway sqlite file so sql_app.db is never touched.
+"""
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends,FastAPI
+from sqlalchemy import create_engine,insert,or_,select
+from sqlalchemy.ext.asyncio import async_sessionmaker,create_async_engine
+from sqlalchemy.orm import Session,sessionmaker
+
+from app import crud,models,schemas
+from app.cache import MemoryCache
+from app.main import app,get_db,get_read_db
+
+
+def temp_database():
+    path=os.path.join(tempfile.mkdtemp(),"bench.db")
+    # both pools sized to the 40 threadpool slots, a smaller sync pool deadlocks once every slot waits on a connection
+    engine=create_engine(f"sqlite:///{path}",connect_args={"check_same_thread": False},pool_size=20,max_overflow=20)
+    models.Base.metadata.create_all(bind=engine)
+    async_engine=create_async_engine(f"sqlite+aiosqlite:///{path}",pool_size=20,max_overflow=20)
+    return engine,async_engine
+
+
+def seed(engine,users:int=100,items_per_user:int=5):
+    with Session(engine) as db:
+        for u in range(users):
+            db_user=models.User(email=f"user{u}@example.com",hashed_password="nothashed")
+            db_user.items=[models.Item(title=f"item {i}",description="bench") for i in range(items_per_user)]
+            db.add(db_user)
+        db.commit()
+
+
+def sync_app(engine):
+    # the blocking Session path the app served before the async engine, kept here as the baseline
+    SessionLocal=sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    sync=FastAPI()
+
+    def get_sync_db():
+        db=SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @sync.get("/users/",response_model=list[schemas.User])
+    def read_users(skip:int=0, limit:int=100, db:Session=Depends(get_sync_db)):
+        return db.query(models.User).offset(skip).limit(limit).all()
+
+    @sync.get("/users/{user_id}",response_model=schemas.User)
+    def read_user(user_id:int, db:Session=Depends(get_sync_db)):
+        return db.query(models.User).filter(models.User.id == user_id).first()
+
+    return sync
+
+
+def async_app(async_engine):
+    AsyncSessionLocal=async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def get_bench_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db]=get_bench_db
+    app.dependency_overrides[get_read_db]=get_bench_db
+    crud.user_cache.backend=MemoryCache(maxsize=0) # measure the database path, not the user cache
+    return app
+
+
+async def load(asgi_app,paths:list[str],concurrency:int):
+    latencies=[]
+    semaphore=asyncio.Semaphore(concurrency)
+    transport=httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport,base_url="http://bench") as client:
+        async def one(path):
+            async with semaphore:
+                start=time.perf_counter()
+                response=await client.get(path)
+                latencies.append(time.perf_counter()-start)
+                response.raise_for_status()
+        started=time.perf_counter()
+        await asyncio.gather(*(one(p) for p in paths))
+        elapsed=time.perf_counter()-started
+    return len(paths)/elapsed,statistics.quantiles(latencies,n=100)[98]
+
+
+def bench_sync_vs_async(requests:int=2000,concurrency:int=64):
+    engine,async_engine=temp_database()
+    seed(engine)
+    paths=[f"/users/{i%100+1}" for i in range(requests)]+["/users/?limit=20"]*(requests//10)
+    print(f"sync vs async: {len(paths)} requests, concurrency {concurrency}")
+    for name,asgi_app in (("sync",sync_app(engine)),("async",async_app(async_engine))):
+        rps,p99=asyncio.run(load(asgi_app,paths,concurrency))
+        print(f"  {name:<6} {rps:8.0f} req/s   p99 {p99*1000:7.2f} ms")
+    app.dependency_overrides.clear()
+
+
+async def time_page(AsyncSessionLocal,repeat:int,**page):
+    async with AsyncSessionLocal() as db:
+        start=time.perf_counter()
+        for _ in range(repeat):
+            await crud.get_items(db,limit=100,**page)
+        return (time.perf_counter()-start)/repeat
+
+
+def bench_deep_pages(rows:int=500_000,repeat:int=20):
+    engine,async_engine=temp_database()
+    with engine.begin() as conn:
+        conn.execute(insert(models.User),[dict(email="owner@example.com",hashed_password="nothashed")])
+        conn.execute(insert(models.Item),[dict(title=f"item {i}",description="bench",owner_id=1) for i in range(rows)])
+    AsyncSessionLocal=async_sessionmaker(async_engine, expire_on_commit=False)
+    print(f"page latency by depth over {rows} items, limit 100")
+    for depth in (0,rows//100,rows//10,rows//2,rows-100):
+        offset=asyncio.run(time_page(AsyncSessionLocal,repeat,skip=depth))
+        keyset=asyncio.run(time_page(AsyncSessionLocal,repeat,after_id=depth))
+        print(f"  row {depth:>7}   offset {offset*1000:7.2f} ms   cursor {keyset*1000:7.2f} ms")
+
+
+async def check_then_insert(db,user:schemas.UserCreate):
+    # the signup path before create_user relied on the unique index: lookup, insert, then refresh
+    result=await db.execute(select(models.User).filter(models.User.email == user.email))
+    if result.scalars().first():
+        raise ValueError("Email already registered")
+    db_user=models.User(email=user.email,hashed_password=user.password+"nothashed")
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+
+async def time_signups(AsyncSessionLocal,create,prefix:str,signups:int):
+    start=time.perf_counter()
+    for n in range(signups):
+        async with AsyncSessionLocal() as db:
+            await create(db,schemas.UserCreate(email=f"{prefix}{n}@example.com",password="secret"))
+    return signups/(time.perf_counter()-start)
+
+
+def bench_signups(signups:int=2000):
+    _,async_engine=temp_database()
+    AsyncSessionLocal=async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    crud.user_cache.backend=MemoryCache(maxsize=0)
+    print(f"signup throughput, {signups} sequential signups")
+    for name,create in (("check-then-insert",check_then_insert),("insert-returning",crud.create_user)):
+        rate=asyncio.run(time_signups(AsyncSessionLocal,create,name,signups))
+        print(f"  {name:<18} {rate:8.0f} signups/s")
+
+
+async def time_search(AsyncSessionLocal,search,repeat:int):
+    async with AsyncSessionLocal() as db:
+        start=time.perf_counter()
+        for _ in range(repeat):
+            rows=await search(db)
+        return (time.perf_counter()-start)/repeat,len(rows)
+
+
+def bench_search(rows:int=1_000_000,repeat:int=5):
+    engine,async_engine=temp_database()
+    words=[f"word{n}" for n in range(5000)]
+    rng=random.Random(0)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User),[dict(email="owner@example.com",hashed_password="nothashed")])
+        for start in range(0,rows,50_000):
+            conn.execute(insert(models.Item),[
+                dict(title=" ".join(rng.choices(words,k=3)),description=" ".join(rng.choices(words,k=12)),owner_id=1)
+                for _ in range(start,min(rows,start+50_000))
+            ])
+        conn.execute(insert(models.Item),[dict(title="needle",description="rare",owner_id=1) for _ in range(20)])
+    AsyncSessionLocal=async_sessionmaker(async_engine, expire_on_commit=False)
+
+    def like(term):
+        async def search(db):
+            pattern=f"%{term}%"
+            query=select(models.Item).filter(or_(models.Item.title.like(pattern),models.Item.description.like(pattern))).limit(100)
+            return (await db.execute(query)).scalars().all()
+        return search
+
+    def fts(term):
+        async def search(db):
+            return await crud.search_items(db,q=term,limit=100)
+        return search
+
+    # LIKE can stop after 100 hits of a common word but must scan every row for a rare one, fts5 ranks all matches
+    print(f"search over {rows} items, first page of 100")
+    for term in ("word42","needle"):
+        for name,search in (("LIKE '%q%'",like(term)),("fts5 MATCH",fts(term))):
+            elapsed,found=asyncio.run(time_search(AsyncSessionLocal,search,repeat))
+            print(f"  {term:<7} {name:<11} {elapsed*1000:9.2f} ms   ({found} rows)")
+
+
+if __name__ == "__main__":
+    bench_sync_vs_async()
+    bench_deep_pages()
+    bench_signups()
+    bench_search()
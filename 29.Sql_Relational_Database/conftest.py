@@ -0,0 +1,78 @@
+import os
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine,event
+from sqlalchemy.ext.asyncio import async_sessionmaker,create_async_engine
+
+from app import models
+from app.cache import user_cache
+from app.database import ReplicaSync,RoutingSession
+from app.main import app,get_db,get_read_db
+
+
+@pytest.fixture(scope="session")
+def async_engine():
+    # a throwaway sqlite file per test run, sql_app.db is never touched
+    path=os.path.join(tempfile.mkdtemp(),"test.db")
+    models.Base.metadata.create_all(bind=create_engine(f"sqlite:///{path}"))
+    return create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+
+@pytest.fixture(scope="session")
+def client(async_engine):
+    TestingSessionLocal=async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_db():
+        async with TestingSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db]=override_get_db
+    app.dependency_overrides[get_read_db]=override_get_db # no replica in tests, reads share the primary
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def queries(async_engine):
+    """Every SQL statement the app runs while the test is active."""
+    statements=[]
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine,"before_cursor_execute",record)
+    yield statements
+    event.remove(async_engine.sync_engine,"before_cursor_execute",record)
+
+
+@pytest.fixture
+def replica_client(tmp_path,monkeypatch):
+    """A client whose read routes go through RoutingSession, with a replica that is only copied when the test says so."""
+    primary=create_async_engine(f"sqlite+aiosqlite:///{tmp_path/'primary.db'}")
+    replica=create_async_engine(f"sqlite+aiosqlite:///{tmp_path/'replica.db'}")
+    sync_primary=create_engine(f"sqlite:///{tmp_path/'primary.db'}")
+    models.Base.metadata.create_all(bind=sync_primary)
+    # copied over plain sqlite engines like the app does, the async ones only serve requests
+    replica_sync=ReplicaSync(primary=sync_primary,replica=create_engine(f"sqlite:///{tmp_path/'replica.db'}"),
+                             writers=[primary.sync_engine])
+    replica_sync.copy()
+    WriteSessionLocal=async_sessionmaker(primary, autoflush=False, expire_on_commit=False)
+    ReadSessionLocal=async_sessionmaker(sync_session_class=RoutingSession,primary=primary.sync_engine,
+                                        replica=replica.sync_engine,replica_sync=replica_sync,
+                                        autoflush=False,expire_on_commit=False)
+
+    async def override_get_db():
+        async with WriteSessionLocal() as db:
+            yield db
+
+    async def override_get_read_db():
+        async with ReadSessionLocal() as db:
+            yield db
+
+    monkeypatch.setitem(app.dependency_overrides,get_db,override_get_db)
+    monkeypatch.setitem(app.dependency_overrides,get_read_db,override_get_read_db)
+    user_cache.backend.clear() # user ids restart at 1 in this database
+    yield TestClient(app),replica_sync
+    user_cache.backend.clear()
@@ -0,0 +1,286 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from sqlalchemy import create_engine,event
+
+from app import models
+from app.database import ReplicaSync,RoutingSession
+from app.main import app
+
+
+def test_create_and_read_user(client):
+    response = client.post("/users/",json={"email": "deadpool@example.com","password": "chimichangas4life"})
+    assert response.status_code == 200
+    user = response.json()
+    assert user["email"] == "deadpool@example.com"
+    assert user["is_active"] is True
+    assert user["items"] == []
+
+    response = client.post(f"/users/{user['id']}/items/",json={"title": "katana","description": "sharp"})
+    assert response.status_code == 200
+    assert response.json()["owner_id"] == user["id"]
+
+    response = client.get(f"/users/{user['id']}")
+    assert response.status_code == 200
+    assert [item["title"] for item in response.json()["items"]] == ["katana"]
+
+def test_create_duplicate_user(client):
+    client.post("/users/",json={"email": "wolverine@example.com","password": "snikt"})
+    response = client.post("/users/",json={"email": "wolverine@example.com","password": "snikt"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Email already registered"}
+
+def test_read_missing_user(client):
+    response = client.get("/users/999999")
+    assert response.status_code == 404
+
+def test_cursor_pagination(client):
+    for n in range(5):
+        client.post("/users/",json={"email": f"page{n}@example.com","password": "secret"})
+    ids=[user["id"] for user in client.get("/users/?limit=1000").json()]
+
+    seen=[]
+    response = client.get("/users/?limit=2")
+    while True:
+        assert response.status_code == 200
+        seen+=[user["id"] for user in response.json()]
+        if "x-next-cursor" not in response.headers:
+            break
+        response = client.get("/users/",params={"limit": 2,"cursor": response.headers["x-next-cursor"]})
+    assert seen == ids
+    assert client.get("/users/?skip=2&limit=2").json() == client.get("/users/?limit=1000").json()[2:4]
+
+def test_invalid_cursor(client):
+    response = client.get("/items/?cursor=not-a-cursor")
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+def test_read_users_query_count_does_not_grow_with_users(client,queries):
+    for n in range(10):
+        user = client.post("/users/",json={"email": f"eager{n}@example.com","password": "secret"}).json()
+        client.post(f"/users/{user['id']}/items/",json={"title": f"item {n}"})
+
+    queries.clear()
+    users = client.get("/users/?limit=100").json()
+    assert len(users) >= 10
+    assert len(queries) == 2 # the users page and one IN query for all their items
+
+    queries.clear()
+    response = client.get(f"/users/{users[-1]['id']}")
+    assert response.json()["items"][0]["title"] == "item 9"
+    assert len(queries) == 1
+
+def test_bulk_create_users_reports_duplicates(client):
+    client.post("/users/",json={"email": "taken@example.com","password": "secret"})
+    response = client.post("/users/bulk",json=[
+        {"email": "bulk0@example.com","password": "secret"},
+        {"email": "taken@example.com","password": "secret"},
+        {"email": "bulk1@example.com","password": "secret"},
+        {"email": "bulk0@example.com","password": "secret"},
+    ])
+    assert response.status_code == 200
+    result = response.json()
+    assert [row["index"] for row in result["created"]] == [0,2]
+    assert result["errors"] == [
+        {"index": 1,"detail": "Email already registered"},
+        {"index": 3,"detail": "Email already registered"},
+    ]
+    assert client.get(f"/users/{result['created'][1]['id']}").json()["email"] == "bulk1@example.com"
+
+def test_bulk_create_items(client):
+    user = client.post("/users/",json={"email": "hoarder@example.com","password": "secret"}).json()
+    response = client.post(f"/users/{user['id']}/items/bulk",json=[{"title": f"thing {n}"} for n in range(3)])
+    assert response.status_code == 200
+    created = response.json()["created"]
+    assert [row["index"] for row in created] == [0,1,2]
+    items = client.get(f"/users/{user['id']}").json()["items"]
+    assert [item["id"] for item in items] == [row["id"] for row in created]
+    assert client.post("/users/999999/items/bulk",json=[{"title": "orphan"}]).status_code == 404
+
+def test_read_user_is_cached_until_its_items_change(client,queries):
+    user = client.post("/users/",json={"email": "cached@example.com","password": "secret"}).json()
+    hits = client.get("/cache/stats").json()["hits"]
+
+    queries.clear()
+    assert client.get(f"/users/{user['id']}").json()["items"] == []
+    assert queries == []
+    assert client.get("/cache/stats").json()["hits"] == hits+1
+
+    client.post(f"/users/{user['id']}/items/",json={"title": "fresh"})
+    queries.clear()
+    assert [item["title"] for item in client.get(f"/users/{user['id']}").json()["items"]] == ["fresh"]
+    assert len(queries) == 1
+
+@pytest.mark.usefixtures("client")
+def test_concurrent_signups_register_the_email_once():
+    async def signup_race():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport,base_url="http://test") as race:
+            return await asyncio.gather(*(race.post("/users/",json={"email": "race@example.com","password": "secret"}) for _ in range(10)))
+
+    responses = asyncio.run(signup_race())
+    assert sorted(response.status_code for response in responses) == [200]+[400]*9
+
+def test_export_items(client):
+    user = client.post("/users/",json={"email": "exporter@example.com","password": "secret"}).json()
+    client.post(f"/users/{user['id']}/items/bulk",json=[{"title": "a","description": "first"},{"title": "b"}])
+
+    response = client.get("/items/export",params={"owner_id": user["id"]})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(row["title"],row["description"]) for row in rows] == [("a","first"),("b",None)]
+
+    response = client.get("/items/export",params={"owner_id": user["id"],"format": "csv"})
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines()[0] == "id,title,description,owner_id"
+    assert len(response.text.splitlines()) == 3
+
+def test_export_users(client):
+    client.post("/users/",json={"email": "exported@example.com","password": "secret"})
+    emails = [json.loads(line)["email"] for line in client.get("/users/export").text.splitlines()]
+    assert "exported@example.com" in emails
+    assert client.get("/users/export?format=csv&is_active=false").text.splitlines() == ["id,email,is_active"]
+
+def test_routing_session_reads_replica_only_while_in_sync(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path/'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path/'replica.db'}")
+    models.Base.metadata.create_all(bind=primary)
+    replica_sync = ReplicaSync(primary=primary,replica=replica,writers=[primary])
+    replica_sync.copy()
+
+    def session():
+        return RoutingSession(primary=primary,replica=replica,replica_sync=replica_sync)
+
+    with session() as db:
+        assert db.get_bind() is replica
+        db.add(models.User(email="primary@example.com",hashed_password="secret"))
+        db.commit()
+        assert db.get_bind() is primary
+        assert db.query(models.User).filter_by(email="primary@example.com").first() is not None
+
+    with session() as db:
+        assert db.get_bind() is primary # the replica is behind, so reads stay on the primary
+        assert db.query(models.User).filter_by(email="primary@example.com").first() is not None
+    replica_sync.copy()
+    with session() as db:
+        assert db.fresh()
+        assert db.get_bind() is replica
+        assert db.query(models.User).filter_by(email="primary@example.com").first() is not None
+
+def test_replica_copy_during_a_commit_stays_stale(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path/'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path/'replica.db'}")
+    replica_sync = ReplicaSync(primary=primary,replica=replica,writers=[primary])
+    replica_sync.copy()
+    assert not replica_sync.stale
+    event.listen(replica,"engine_connect",replica_sync.committed) # a commit lands while the copy runs
+    replica_sync.copy()
+    assert replica_sync.stale
+
+def test_replica_sync_keeps_running_after_a_failed_copy(tmp_path):
+    replica_sync = ReplicaSync(primary=create_engine(f"sqlite:///{tmp_path/'primary.db'}"),
+                               replica=create_engine(f"sqlite:///{tmp_path/'replica.db'}"),writers=[])
+    attempts = []
+
+    def failing_copy():
+        attempts.append(1)
+        raise OSError("disk full")
+
+    replica_sync.copy = failing_copy
+
+    async def sync_for_a_while():
+        syncing = asyncio.create_task(replica_sync.run(interval=0.01))
+        await asyncio.sleep(0.1)
+        assert not syncing.done()
+        syncing.cancel()
+
+    asyncio.run(sync_for_a_while())
+    assert len(attempts) > 1
+
+def test_read_your_writes_with_a_lagging_replica(replica_client):
+    client,replica_sync = replica_client
+    user = client.post("/users/",json={"email": "lagging@example.com","password": "secret"}).json()
+    client.post(f"/users/{user['id']}/items/",json={"title": "written"})
+    assert replica_sync.stale # nothing copied the replica yet
+
+    response = client.get(f"/users/{user['id']}")
+    assert response.status_code == 200
+    assert [item["title"] for item in response.json()["items"]] == ["written"]
+    assert [item["title"] for item in client.get(f"/users/{user['id']}/items/").json()] == ["written"]
+
+    replica_sync.copy()
+    assert [item["title"] for item in client.get(f"/users/{user['id']}/items/").json()] == ["written"]
+
+def test_search_items(client):
+    user = client.post("/users/",json={"email": "searcher@example.com","password": "secret"}).json()
+    client.post(f"/users/{user['id']}/items/bulk",json=[
+        {"title": "zebra crossing","description": "stripes"},
+        {"title": "zebra","description": "zebra zebra"},
+        {"title": "horse","description": "not a zebra"},
+        {"title": "cat","description": "\"quoted\" OR ("},
+    ])
+
+    titles = [item["title"] for item in client.get("/items/search",params={"q": "zebra"}).json()]
+    assert sorted(titles) == ["horse","zebra","zebra crossing"]
+    assert titles[0] == "zebra"
+
+    pages = []
+    response = client.get("/items/search",params={"q": "zebra","limit": 1})
+    while "x-next-cursor" in response.headers:
+        pages += response.json()
+        response = client.get("/items/search",params={"q": "zebra","limit": 1,"cursor": response.headers["x-next-cursor"]})
+    pages += response.json()
+    assert [item["title"] for item in pages] == titles
+
+    assert [item["title"] for item in client.get("/items/search",params={"q": "\"quoted\" OR ("}).json()] == ["cat"]
+
+def test_read_user_items(client):
+    user = client.post("/users/",json={"email": "poweruser@example.com","password": "secret"}).json()
+    other = client.post("/users/",json={"email": "bystander@example.com","password": "secret"}).json()
+    client.post(f"/users/{other['id']}/items/",json={"title": "not mine"})
+    client.post(f"/users/{user['id']}/items/bulk",json=[{"title": f"mine {n}"} for n in range(5)])
+
+    titles = []
+    response = client.get(f"/users/{user['id']}/items/?limit=2")
+    while "x-next-cursor" in response.headers:
+        titles += [item["title"] for item in response.json()]
+        response = client.get(f"/users/{user['id']}/items/",params={"limit": 2,"cursor": response.headers["x-next-cursor"]})
+    titles += [item["title"] for item in response.json()]
+    assert titles == [f"mine {n}" for n in range(5)]
+
+    assert client.get("/users/999999/items/").status_code == 404
+
+def test_user_items_page_uses_owner_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path/'plan.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN SELECT * FROM items WHERE owner_id = 1 AND id > 10 ORDER BY id LIMIT 100").all()
+    assert "ix_items_owner_id_id" in plan[0][-1]
+    assert not any("TEMP B-TREE" in row[-1] for row in plan)
+
+def test_metrics_use_route_templates(client):
+    client.get("/users/999999")
+    lines = client.get("/metrics").text.splitlines()
+    assert any(line.startswith('http_requests_total{method="GET",route="/users/{user_id}",status="4xx"}') for line in lines)
+    assert not any("999999" in line.split(" ")[0] for line in lines) # labels only, sample values are floats
+
+def test_compression(client):
+    client.post("/users/bulk",json=[{"email": f"gzip{i}@example.com","password": "secret"} for i in range(40)])
+
+    response = client.get("/users/",params={"limit": 40},headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert 'compress;dur=' in response.headers["server-timing"]
+    assert len(response.json()) == 40 # httpx decodes it again
+
+    response = client.get("/users/export",headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip" # streamed, so compressed chunk by chunk
+    assert "content-length" not in response.headers
+    assert "gzip0@example.com" in response.text
+
+    small = client.get("/cache/stats",headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in client.get("/users/",headers={"Accept-Encoding": "identity"}).headers
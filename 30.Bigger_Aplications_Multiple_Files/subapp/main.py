@@ -1,5 +1,7 @@
 from fastapi import FastAPI,Depends
 from .dependencies import get_query_token,get_token_header
+from .metrics import install_metrics
+from .responsecache import ResponseCacheMiddleware
 from .routers import users,items
 # from router.users import router as user_router #esari ni garna sakinxa
 # we cann do in __init_- ma
@@ -9,6 +11,8 @@ from .routers import users,items
 app=FastAPI(dependencies=[Depends(get_query_token)])
 app.include_router(users.router)
 app.include_router(items.router)
+app.add_middleware(ResponseCacheMiddleware) # PUT /items/... clears the cached /items/
+install_metrics(app) # like every route here, /metrics needs ?token=
 
 
 @app.get("/")
@@ -0,0 +1,100 @@
+from bisect import bisect_left
+from time import perf_counter
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from starlette.types import ASGIApp,Message,Receive,Scope,Send
+
+# request metrics per route template (/items/{item_id}, never the raw path), served in prometheus text format:
+# request counts by status class, requests in flight and latency histograms with fixed buckets.
+# Mount it on any app with install_metrics(app).
+
+BUCKETS=(0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1.0,2.5,5.0,10.0)
+STATUS_CLASSES=("1xx","2xx","3xx","4xx","5xx")
+
+
+class Metrics:
+    """Plain counters, only ever touched from the event loop so no locking is needed."""
+
+    def __init__(self,buckets:tuple[float,...]=BUCKETS):
+        self.buckets=buckets
+        self.in_flight=0
+        # (method, route) -> [count per bucket..., +Inf count, latency sum, count per status class...]
+        self.routes:dict[tuple[str,str],list]={}
+        self.sum_index=len(buckets)+1
+
+    def record(self,method:str,route:str,status:int,seconds:float):
+        stats=self.routes.get((method,route))
+        if stats is None:
+            stats=self.routes[(method,route)]=[0]*(self.sum_index)+[0.0]+[0]*len(STATUS_CLASSES)
+        stats[bisect_left(self.buckets,seconds)]+=1
+        stats[self.sum_index]+=seconds
+        stats[self.sum_index+min(max(status//100,1),5)]+=1
+
+    def render(self) -> str:
+        lines=[
+            "# HELP http_requests_total Requests by route template and status class.",
+            "# TYPE http_requests_total counter",
+        ]
+        routes=sorted(self.routes.items())
+        for (method,route),stats in routes:
+            for status,count in zip(STATUS_CLASSES,stats[self.sum_index+1:]):
+                if count:
+                    lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+        lines+=[
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_request_duration_seconds Time to the end of the response body by route template.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method,route),stats in routes:
+            labels=f'method="{method}",route="{route}"'
+            cumulative=0
+            for bound,count in zip(self.buckets,stats):
+                cumulative+=count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative+=stats[len(self.buckets)]
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {stats[self.sum_index]}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+        return "\n".join(lines)+"\n"
+
+
+class MetricsMiddleware:
+    def __init__(self,app:ASGIApp,metrics:Metrics):
+        self.app=app
+        self.metrics=metrics
+
+    async def __call__(self,scope:Scope,receive:Receive,send:Send):
+        if scope["type"] != "http":
+            await self.app(scope,receive,send)
+            return
+        metrics=self.metrics
+        status=500 # stays 500 if the app raises before starting a response
+        start=perf_counter()
+
+        async def send_with_status(message:Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status=message["status"]
+            await send(message)
+
+        metrics.in_flight+=1
+        try:
+            await self.app(scope,receive,send_with_status)
+        finally:
+            metrics.in_flight-=1
+            route=scope.get("route") # set by the router once a route matched
+            metrics.record(scope["method"],getattr(route,"path","unmatched"),status,perf_counter()-start)
+
+
+def install_metrics(app:FastAPI,path:str="/metrics") -> Metrics:
+    metrics=Metrics()
+    app.add_middleware(MetricsMiddleware,metrics=metrics)
+
+    @app.get(path,include_in_schema=False)
+    async def read_metrics():
+        return PlainTextResponse(metrics.render(),media_type="text/plain; version=0.0.4")
+
+    return metrics
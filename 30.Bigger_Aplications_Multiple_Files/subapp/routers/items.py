@@ -1,5 +1,6 @@
 from fastapi import APIRouter,Depends,HTTPException
 from ..dependencies import get_token_header
+from ..responsecache import cache_response
 
 router=APIRouter(
     prefix="/items",
@@ -16,6 +17,7 @@ fake_items_db = {
 }
 
 @router.get('/')
+@cache_response(ttl=30,vary=("x-token",)) # hits skip the token dependencies, so they must match the tokens that passed
 async def read_items():
     return fake_items_db['items']
 
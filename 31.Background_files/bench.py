@@ -0,0 +1,97 @@
+"""
+Notification throughput, run from this folder with: python bench.py
+
+bench_notifications: the first version opened, appended to and closed log.txt in the threadpool for every message, the way
+BackgroundTasks runs a sync function. LogWriter queues the message and writes batches from one task.
+bench_cpu_tasks: how long the event loop stalls while CPU-bound reports run in the threadpool or the process pool.
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from logwriter import FsyncPolicy,LogWriter
+from processpool import ProcessTaskRunner
+from reports import build_report
+
+
+def write_notification(path:str,message:str):
+    with open (path, "a") as log:
+        log.write(message)
+
+
+async def per_call(path:str,messages:int,concurrency:int):
+    async def client(n:int):
+        for i in range(n):
+            await run_in_threadpool(write_notification,path,f"Background task started for user{i}@example.com\n")
+    await asyncio.gather(*(client(messages//concurrency) for _ in range(concurrency)))
+
+
+async def batched(path:str,messages:int,concurrency:int,fsync:FsyncPolicy):
+    writer=LogWriter(path,fsync=fsync)
+    await writer.start()
+
+    async def client(n:int):
+        for i in range(n):
+            await writer.write(f"Background task started for user{i}@example.com\n")
+    await asyncio.gather(*(client(messages//concurrency) for _ in range(concurrency)))
+    await writer.stop() # counted, the messages are only on disk once it returns
+    return writer.stats()
+
+
+def bench_notifications(messages:int=20_000,concurrency:int=50):
+    print(f"{messages} notifications from {concurrency} concurrent requests")
+    with tempfile.TemporaryDirectory() as folder:
+        cases=[("open/append per call",lambda path: per_call(path,messages,concurrency))]
+        cases+=[(f"LogWriter fsync={policy.value}",lambda path,policy=policy: batched(path,messages,concurrency,policy)) for policy in FsyncPolicy]
+        for name,run in cases:
+            path=os.path.join(folder,name.replace(" ","_").replace("/","_"))
+            start=time.perf_counter()
+            stats=asyncio.run(run(path))
+            elapsed=time.perf_counter()-start
+            with open(path) as log:
+                assert sum(1 for _ in log) == messages
+            extra=f"   {stats['batches']} batches, {stats['fsyncs']} fsyncs" if stats else ""
+            print(f"  {name:<26} {messages/elapsed:10.0f} messages/s{extra}")
+
+
+async def loop_lag(submit,tasks:int) -> tuple[float,float]:
+    # a 1ms timer stands in for request handling, its overshoot is time the loop could not serve anyone
+    done=asyncio.Event()
+    worst=0.0
+    start=time.perf_counter()
+    work=asyncio.create_task(submit(tasks,done))
+    while not done.is_set():
+        before=time.perf_counter()
+        await asyncio.sleep(0.001)
+        worst=max(worst,time.perf_counter()-before-0.001)
+    await work
+    return time.perf_counter()-start,worst
+
+
+def bench_cpu_tasks(tasks:int=16):
+    async def in_threadpool(n:int,done:asyncio.Event):
+        await asyncio.gather(*(run_in_threadpool(build_report,f"user{i}@example.com") for i in range(n)))
+        done.set()
+
+    async def in_process_pool(n:int,done:asyncio.Event):
+        runner=ProcessTaskRunner(max_workers=os.cpu_count() or 2,max_pending=n)
+        runner.start()
+        for i in range(n):
+            runner.submit_nowait(build_report,f"user{i}@example.com")
+        await runner.shutdown()
+        done.set()
+        stats=runner.stats()
+        print(f"  pickling {stats['pickle_seconds']*1e6/n:.1f} us and {stats['payload_bytes']/n:.0f} bytes per task")
+
+    print(f"{tasks} build_report tasks")
+    for name,submit in (("threadpool",in_threadpool),("process pool",in_process_pool)):
+        elapsed,worst=asyncio.run(loop_lag(submit,tasks))
+        print(f"  {name:<13} {elapsed:6.2f} s total   worst event loop stall {worst*1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    bench_notifications()
+    bench_cpu_tasks()
@@ -0,0 +1,13 @@
+import os
+import tempfile
+
+import pytest
+
+from jobqueue import JobQueue
+
+
+@pytest.fixture
+def job_queue():
+    # a throwaway queue per test, jobs.db is never touched
+    path=os.path.join(tempfile.mkdtemp(),"jobs.db")
+    return JobQueue(path,visibility_timeout=0.2,max_attempts=3,backoff=0.1)
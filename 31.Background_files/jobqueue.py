@@ -0,0 +1,139 @@
+import asyncio
+import importlib
+import inspect
+import json
+import sqlite3
+import time
+import traceback
+from threading import Lock
+
+# durable replacement for BackgroundTasks: jobs are rows in sqlite, so they survive restarts and run in a separate
+# worker process (python worker.py) instead of after the response in the serving one.
+# A pending job is visible once run_at has passed. Leasing it pushes run_at out by the visibility timeout, so a job
+# whose worker died simply becomes visible again, and a failure pushes it out by the backoff instead.
+
+
+def task_name(func) -> str:
+    if "<" in func.__qualname__:
+        raise ValueError(f"{func.__qualname__} is not importable by name, jobs need a module level function")
+    return f"{func.__module__}:{func.__qualname__}"
+
+
+def resolve(name:str):
+    module,_,qualname=name.partition(":")
+    target=importlib.import_module(module)
+    for attribute in qualname.split("."):
+        target=getattr(target,attribute)
+    return target
+
+
+class JobQueue:
+    def __init__(self,path:str,visibility_timeout:float=30.0,max_attempts:int=5,backoff:float=1.0,max_backoff:float=300.0):
+        self.db=sqlite3.connect(path,check_same_thread=False,isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL") # workers lease while the app enqueues
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, task TEXT NOT NULL, args TEXT NOT NULL, "
+            "state TEXT NOT NULL DEFAULT 'pending', run_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "max_attempts INTEGER NOT NULL, error TEXT)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS ix_jobs_state_run_at ON jobs (state, run_at)")
+        self.visibility_timeout=visibility_timeout
+        self.max_attempts=max_attempts
+        self.backoff=backoff
+        self.max_backoff=max_backoff
+        self.lock=Lock()
+
+    def enqueue(self,func,*args,**kwargs) -> int:
+        with self.lock:
+            return self.db.execute(
+                "INSERT INTO jobs (task, args, run_at, max_attempts) VALUES (?, ?, ?, ?)",
+                (task_name(func),json.dumps([args,kwargs]),time.time(),self.max_attempts)).lastrowid
+
+    def lease(self) -> tuple[int,str,list,dict,int]|None:
+        """The next visible job as (id, task, args, kwargs, attempt), hidden from other workers until the lease runs out."""
+        now=time.time()
+        with self.lock:
+            # the last lease ran out without complete() or fail(), the job keeps killing its worker (OOM, segfault)
+            self.db.execute(
+                "UPDATE jobs SET state = 'dead', error = 'lease expired on the last attempt' "
+                "WHERE state = 'pending' AND run_at <= ? AND attempts >= max_attempts",(now,))
+            row=self.db.execute(
+                "UPDATE jobs SET run_at = ?, attempts = attempts + 1 WHERE id = ("
+                "SELECT id FROM jobs WHERE state = 'pending' AND run_at <= ? ORDER BY run_at LIMIT 1) "
+                "RETURNING id, task, args, attempts",
+                (now+self.visibility_timeout,now)).fetchone()
+        if row is None:
+            return None
+        job_id,task,args,attempt=row
+        args,kwargs=json.loads(args)
+        return job_id,task,args,kwargs,attempt
+
+    def complete(self,job_id:int):
+        with self.lock:
+            self.db.execute("DELETE FROM jobs WHERE id = ?",(job_id,))
+
+    def fail(self,job_id:int,attempt:int,error:str):
+        # retried with exponential backoff until max_attempts, then parked as 'dead' for someone to look at.
+        # attempts = ? skips the update when the lease expired and another worker already took the job over
+        delay=min(self.backoff*2**(attempt-1),self.max_backoff)
+        with self.lock:
+            self.db.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'pending' END, "
+                "run_at = ?, error = ? WHERE id = ? AND attempts = ?",
+                (time.time()+delay,error,job_id,attempt))
+
+    def stats(self) -> dict:
+        with self.lock:
+            counts=dict(self.db.execute("SELECT state, count(*) FROM jobs GROUP BY state").fetchall())
+        return dict(pending=counts.get("pending",0),dead=counts.get("dead",0))
+
+
+class JobTasks:
+    """Same add_task as BackgroundTasks, but the job is committed to the queue before the response goes out."""
+
+    def __init__(self,queue:JobQueue):
+        self.queue=queue
+
+    def add_task(self,func,*args,**kwargs) -> int:
+        return self.queue.enqueue(func,*args,**kwargs)
+
+
+class Worker:
+    """Runs leased jobs, up to concurrency at a time. Async tasks run on the loop, plain functions in threads."""
+
+    def __init__(self,queue:JobQueue,concurrency:int=8,poll_interval:float=0.2):
+        self.queue=queue
+        self.concurrency=concurrency
+        self.poll_interval=poll_interval
+        self.processed=self.failed=0
+
+    async def run_job(self,job_id:int,task:str,args:list,kwargs:dict,attempt:int):
+        try:
+            func=resolve(task)
+            if inspect.iscoroutinefunction(func):
+                await func(*args,**kwargs)
+            else:
+                await asyncio.to_thread(func,*args,**kwargs)
+        except Exception:
+            self.failed+=1
+            await asyncio.to_thread(self.queue.fail,job_id,attempt,traceback.format_exc(limit=5))
+        else:
+            self.processed+=1
+            await asyncio.to_thread(self.queue.complete,job_id)
+
+    async def run(self,stop:asyncio.Event|None=None):
+        stop=stop or asyncio.Event()
+        running:set[asyncio.Task]=set()
+        while not stop.is_set():
+            job=await asyncio.to_thread(self.queue.lease) if len(running) < self.concurrency else None
+            if job is not None:
+                task=asyncio.create_task(self.run_job(*job))
+                running.add(task)
+                task.add_done_callback(running.discard)
+                continue
+            # nothing visible (or every slot busy), wait for a slot or the next poll
+            stopping=asyncio.create_task(stop.wait())
+            await asyncio.wait(running|{stopping},timeout=self.poll_interval,return_when=asyncio.FIRST_COMPLETED)
+            stopping.cancel()
+        if running:
+            await asyncio.wait(running) # jobs already leased finish before the worker exits
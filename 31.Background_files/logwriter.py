@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import os
+from enum import Enum
+
+logger=logging.getLogger(__name__)
+
+# one writer task owns the log file: messages are queued by the request side, coalesced and written in batches
+# off the event loop, so a notification costs a queue put instead of an open/append/close per call.
+
+
+class FsyncPolicy(str,Enum):
+    NEVER="never"       # leave it to the OS, a crash can lose the last few seconds
+    INTERVAL="interval" # at most one fsync every fsync_interval seconds
+    ALWAYS="always"     # after every batch, nothing acknowledged by a flush is lost
+
+
+class LogWriter:
+    def __init__(self,path:str,max_batch:int=512,flush_interval:float=0.05,fsync:FsyncPolicy=FsyncPolicy.INTERVAL,
+                 fsync_interval:float=1.0,max_queue:int=10_000):
+        self.path=path
+        self.max_batch=max_batch         # flush as soon as this many messages are waiting
+        self.flush_interval=flush_interval # or once the oldest waiting message is this old
+        self.fsync=FsyncPolicy(fsync)
+        self.fsync_interval=fsync_interval
+        self.max_queue=max_queue         # writers wait once the disk falls this far behind
+        self.messages=self.batches=self.fsyncs=self.errors=0
+        self.error:Exception|None=None # the last failed flush, cleared by the next one that works
+        self._queue:asyncio.Queue[tuple[str,asyncio.Future]|None]|None=None
+        self._stopping=False
+        self._task:asyncio.Task|None=None
+
+    async def start(self):
+        # made here and not in __init__, they belong to the loop that runs the writer task
+        self._queue=asyncio.Queue(self.max_queue)
+        self._full=asyncio.Event()
+        self._stopping=False
+        self.error=None
+        self._file=await asyncio.to_thread(open,self.path,"a")
+        self._synced=asyncio.get_running_loop().time()
+        self._task=asyncio.create_task(self._run())
+
+    async def write(self,message:str) -> asyncio.Future:
+        """Queue message, the returned future resolves once its batch is in the file (and fsynced, if this batch is).
+        A failed flush fails the futures of that batch only, later writes are tried again."""
+        flushed=asyncio.get_running_loop().create_future()
+        await self._queue.put((message,flushed))
+        if self._queue.qsize() >= self.max_batch:
+            self._full.set()
+        return flushed
+
+    async def stop(self):
+        """Flush everything queued so far, fsync and close the file."""
+        if self._task is None:
+            return
+        self._stopping=True
+        await self._queue.put(None)
+        self._full.set()
+        await self._task
+        self._task=None
+        await asyncio.to_thread(self._close)
+
+    async def _run(self):
+        loop=asyncio.get_running_loop()
+        closing=False
+        while not closing:
+            batch=[await self._queue.get()]
+            if not self._stopping:
+                try:
+                    await asyncio.wait_for(self._full.wait(),self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if self._queue.qsize() >= self.max_batch:
+                self._full.set() # a full batch is already waiting behind this one
+            if batch[-1] is None: # stop() queues it last, so everything before it is in this batch
+                closing=True
+                batch.pop()
+            if not batch:
+                continue
+            sync=self.fsync is FsyncPolicy.ALWAYS or (self.fsync is FsyncPolicy.INTERVAL and loop.time()-self._synced >= self.fsync_interval)
+            try:
+                await asyncio.to_thread(self._flush,"".join(message for message,_ in batch),sync)
+            except Exception as exc:
+                # the batch is lost and its writers see why, the task keeps draining and the next batch is tried as usual
+                logger.exception("writing %d messages to %s failed",len(batch),self.path)
+                self.error=exc
+                self.errors+=1
+                for _,flushed in batch:
+                    if not flushed.done():
+                        flushed.set_exception(exc)
+                        flushed.exception() # marked as retrieved, nobody has to be waiting on it
+                continue
+            self.error=None
+            for _,flushed in batch:
+                if not flushed.done(): # the writer may have given up waiting
+                    flushed.set_result(None)
+            if sync:
+                self._synced=loop.time()
+            self.messages+=len(batch)
+            self.batches+=1
+
+    def _flush(self,data:str,sync:bool):
+        self._file.write(data)
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+            self.fsyncs+=1
+
+    def _close(self):
+        if self.fsync is not FsyncPolicy.NEVER:
+            os.fsync(self._file.fileno())
+        self._file.close()
+
+    def stats(self) -> dict:
+        return dict(messages=self.messages,batches=self.batches,fsyncs=self.fsyncs,errors=self.errors,
+                    last_error=repr(self.error) if self.error else None,
+                    queued=self._queue.qsize() if self._queue else 0)
@@ -1,24 +1,64 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI,Depends
 from datetime import datetime
-from fastapi import BackgroundTasks
 import time
-app=FastAPI()
+from typing import Annotated
+from jobqueue import JobQueue,JobTasks
+from logwriter import FsyncPolicy,LogWriter
+from processpool import ProcessTaskRunner,ProcessTasks
+from reports import build_report
 
+log_writer=LogWriter("log.txt",fsync=FsyncPolicy.INTERVAL)
+job_queue=JobQueue("./jobs.db") # drained by python worker.py
 
+def get_jobs() -> JobTasks:
+    return JobTasks(job_queue)
 
-def write_notification(message:str):
-    with open ("log.txt", "a") as log:
-        log.write(message)
+Jobs=Annotated[JobTasks,Depends(get_jobs)] # use like BackgroundTasks, jobs.add_task(func, *args)
 
+process_runner=ProcessTaskRunner(max_workers=2,max_pending=32) # CPU-bound tasks, off the GIL and the threadpool
 
-def get_query(backgroundtasks:BackgroundTasks,q:str|None=None):
+def get_process_tasks() -> ProcessTasks:
+    return ProcessTasks(process_runner)
+
+CPUTasks=Annotated[ProcessTasks,Depends(get_process_tasks)] # add_task raises 503 once max_pending are queued
+
+@asynccontextmanager
+async def lifespan(app:FastAPI):
+    await log_writer.start()
+    process_runner.start()
+    yield
+    await process_runner.shutdown()
+    await log_writer.stop() # whatever is still queued reaches the file before shutdown
+
+app=FastAPI(lifespan=lifespan)
+
+
+
+async def write_notification(message:str):
+    # the log writer task batches the actual file writes, this returns once the batch with our message is written,
+    # so a job in worker.py (which starts its own log_writer) is only completed when its line is in the file
+    flushed=await log_writer.write(message)
+    await flushed
+
+
+def get_query(backgroundtasks:Jobs,q:str|None=None):
     if q:
         message=f"found query :{q} \n"
         backgroundtasks.add_task(write_notification, message)
     return q
 
 @app.post("/send-notification{email}",status_code=202)
-async def send_notification(email:str,background_task:BackgroundTasks,q:str=Depends(get_query)):
+def send_notification(email:str,background_task:Jobs,q:str=Depends(get_query)):
     message = f"Background task started for {email}\n"
-    background_task.add_task(write_notification, message)
-    return {"message": f"Notification sent "}
\ No newline at end of file
+    background_task.add_task(write_notification, message) # a sqlite commit, so this route runs in the threadpool
+    return {"message": f"Notification sent "}
+
+@app.post("/send-report{email}",status_code=202)
+async def send_report(email:str,cpu_tasks:CPUTasks):
+    cpu_tasks.add_task(build_report,email,then=write_notification) # the finished report goes to the log
+    return {"message": "Report queued"}
+
+@app.get("/tasks/stats")
+async def task_stats():
+    return {"jobs": job_queue.stats(),"process_pool": process_runner.stats(),"log": log_writer.stats()}
\ No newline at end of file
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import multiprocessing
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+from fastapi import HTTPException
+
+logger=logging.getLogger(__name__)
+
+# CPU-bound background work in worker processes, so it neither holds the GIL nor takes threadpool slots away from
+# sync endpoints. At most max_pending tasks are queued or running; past that add_task answers 503 straight away
+# instead of letting work pile up. Arguments are pickled by the caller so the cost shows up in stats().
+# Workers are not forked from the app: it already runs threads (threadpool, aiosqlite, to_thread) and a fork can copy
+# one of their locks mid-use into the child, which then deadlocks. forkserver forks them from a clean process instead.
+
+START_METHOD="forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def run_pickled(payload:bytes) -> tuple[bytes,float]:
+    """Runs in the worker process, returns the pickled result and the time spent in the task itself."""
+    func,args,kwargs=pickle.loads(payload)
+    start=time.perf_counter()
+    result=func(*args,**kwargs)
+    return pickle.dumps(result),time.perf_counter()-start
+
+
+class ProcessTaskRunner:
+    def __init__(self,max_workers:int=2,max_pending:int=32,start_method:str=START_METHOD):
+        self.max_workers=max_workers
+        self.start_method=start_method
+        self.max_pending=max_pending
+        self.pending=0
+        self.submitted=self.completed=self.failed=self.rejected=0
+        self.pickle_seconds=self.unpickle_seconds=self.run_seconds=0.0
+        self.payload_bytes=self.result_bytes=0
+        self.last_error:str|None=None
+        self.lock=Lock()
+        self.pool:ProcessPoolExecutor|None=None
+        self.loop:asyncio.AbstractEventLoop|None=None
+        self.running:set=set()
+
+    def start(self):
+        self.loop=asyncio.get_running_loop()
+        self.pool=ProcessPoolExecutor(self.max_workers,mp_context=multiprocessing.get_context(self.start_method))
+
+    async def shutdown(self):
+        # queued tasks finish and their then callbacks run before the pool goes away
+        await asyncio.gather(*(asyncio.wrap_future(future) for future in list(self.running)))
+        await asyncio.to_thread(self.pool.shutdown,wait=True)
+
+    def submit_nowait(self,func,*args,then=None,**kwargs) -> bool:
+        """Queue func(*args, **kwargs), False when max_pending is reached. then is awaited with the result.
+        Safe to call from sync dependencies running in the threadpool as well as from the event loop."""
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected+=1
+                return False
+            self.pending+=1
+        start=time.perf_counter()
+        try:
+            payload=pickle.dumps((func,args,kwargs))
+        except Exception:
+            with self.lock:
+                self.pending-=1
+            raise
+        with self.lock:
+            self.submitted+=1
+            self.pickle_seconds+=time.perf_counter()-start
+            self.payload_bytes+=len(payload)
+        future=asyncio.run_coroutine_threadsafe(self._run(payload,then),self.loop)
+        self.running.add(future)
+        future.add_done_callback(self.running.discard)
+        return True
+
+    async def _run(self,payload:bytes,then):
+        try:
+            result,run_seconds=await self.loop.run_in_executor(self.pool,run_pickled,payload)
+            start=time.perf_counter()
+            value=pickle.loads(result)
+            unpickle_seconds=time.perf_counter()-start
+            if then is not None:
+                await then(value)
+        except Exception as exc:
+            # from the task itself (re-raised here with its traceback from the worker process), unpickling or then
+            logger.exception("background task in the process pool failed")
+            with self.lock:
+                self.failed+=1
+                self.last_error=repr(exc)
+            return
+        finally:
+            with self.lock:
+                self.pending-=1
+        with self.lock:
+            self.completed+=1
+            self.run_seconds+=run_seconds
+            self.unpickle_seconds+=unpickle_seconds
+            self.result_bytes+=len(result)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return dict(pending=self.pending,max_pending=self.max_pending,submitted=self.submitted,completed=self.completed,
+                        failed=self.failed,rejected=self.rejected,pickle_seconds=self.pickle_seconds,
+                        unpickle_seconds=self.unpickle_seconds,payload_bytes=self.payload_bytes,
+                        result_bytes=self.result_bytes,run_seconds=self.run_seconds,last_error=self.last_error)
+
+
+class ProcessTasks:
+    """add_task like BackgroundTasks, but into the process pool, and the request fails with 503 when it is full."""
+
+    def __init__(self,runner:ProcessTaskRunner):
+        self.runner=runner
+
+    def add_task(self,func,*args,then=None,**kwargs):
+        if not self.runner.submit_nowait(func,*args,then=then,**kwargs):
+            raise HTTPException(status_code=503,detail="Too many background tasks queued",headers={"Retry-After": "1"})
+
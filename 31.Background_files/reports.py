@@ -0,0 +1,10 @@
+# work for the process pool, kept out of main.py so worker processes import next to nothing
+
+
+def build_report(email:str,rounds:int=500_000) -> str:
+    # stand-in for CPU-bound work like rendering a report, runs in a worker process. Plain Python on purpose, it holds
+    # the GIL the whole time, hashlib and most C extensions release it for big inputs and would hide the contention
+    value=int.from_bytes(email.encode()[:8],"little")
+    for _ in range(rounds):
+        value=(value*6364136223846793005+1442695040888963407)&0xFFFFFFFFFFFFFFFF
+    return f"report for {email}: {value:016x}\n"
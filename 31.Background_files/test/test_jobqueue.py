@@ -0,0 +1,116 @@
+import asyncio
+import os
+import tempfile
+import time
+
+import pytest
+
+from jobqueue import Worker,resolve,task_name
+from logwriter import LogWriter
+
+calls=[]
+
+def record(value):
+    calls.append(value)
+
+def explode(value):
+    raise RuntimeError(value)
+
+
+def test_lease_hides_the_job_until_the_visibility_timeout(job_queue):
+    job_id=job_queue.enqueue(record,"a",key=1)
+    assert job_queue.lease() == (job_id,task_name(record),["a"],{"key": 1},1)
+    assert job_queue.lease() is None # leased, so no other worker sees it
+
+    time.sleep(0.25) # the worker died without completing it
+    assert job_queue.lease()[4] == 2
+    job_queue.complete(job_id)
+    time.sleep(0.25)
+    assert job_queue.lease() is None
+    assert resolve(task_name(record)) is record
+
+def test_failures_back_off_then_go_dead(job_queue):
+    job_id=job_queue.enqueue(explode,"boom")
+    for attempt,backoff in ((1,0.1),(2,0.2)):
+        assert job_queue.lease()[4] == attempt
+        job_queue.fail(job_id,attempt,"boom")
+        assert job_queue.lease() is None # backing off
+        time.sleep(backoff+0.05)
+    assert job_queue.lease()[4] == 3
+    job_queue.fail(job_id,3,"boom")
+    assert job_queue.stats() == {"pending": 0,"dead": 1}
+    assert job_queue.db.execute("SELECT error FROM jobs WHERE id = ?",(job_id,)).fetchone() == ("boom",)
+
+def test_job_that_keeps_killing_its_worker_goes_dead(job_queue):
+    job_id=job_queue.enqueue(record,"oom")
+    for attempt in (1,2,3):
+        assert job_queue.lease()[4] == attempt
+        time.sleep(0.25) # the worker died, the lease runs out
+    assert job_queue.lease() is None
+    assert job_queue.stats() == {"pending": 0,"dead": 1}
+    assert job_queue.db.execute("SELECT error FROM jobs WHERE id = ?",(job_id,)).fetchone() == ("lease expired on the last attempt",)
+
+def test_stale_failure_does_not_touch_a_re_leased_job(job_queue):
+    job_id=job_queue.enqueue(record,"a")
+    job_queue.lease()
+    time.sleep(0.25)
+    job_queue.lease() # attempt 2 belongs to another worker now
+    job_queue.fail(job_id,1,"late")
+    assert job_queue.db.execute("SELECT error FROM jobs WHERE id = ?",(job_id,)).fetchone() == (None,)
+
+def test_worker_completes_and_dead_letters(job_queue):
+    calls.clear()
+    job_queue.enqueue(record,"ok")
+    job_queue.enqueue(explode,"boom")
+
+    async def run():
+        stop=asyncio.Event()
+        worker=Worker(job_queue,concurrency=4,poll_interval=0.02)
+        running=asyncio.create_task(worker.run(stop))
+        await asyncio.sleep(1.0) # enough for 3 attempts with 0.1 and 0.2 s backoff
+        stop.set()
+        await running
+        return worker
+
+    worker=asyncio.run(run())
+    assert calls == ["ok"]
+    assert (worker.processed,worker.failed) == (1,3)
+    assert job_queue.stats() == {"pending": 0,"dead": 1}
+
+def test_log_write_resolves_once_the_line_is_in_the_file():
+    path=os.path.join(tempfile.mkdtemp(),"log.txt")
+
+    async def run():
+        writer=LogWriter(path,flush_interval=0.05)
+        await writer.start()
+        flushed=await writer.write("hello\n")
+        assert open(path).read() == "" # still batching
+        await flushed
+        assert open(path).read() == "hello\n"
+        await writer.stop()
+
+    asyncio.run(run())
+
+def test_log_writer_recovers_after_a_failed_flush():
+    path=os.path.join(tempfile.mkdtemp(),"log.txt")
+
+    async def run():
+        writer=LogWriter(path,flush_interval=0.01)
+        await writer.start()
+        flush=writer._flush
+
+        def disk_full(data,sync):
+            writer._flush=flush # only this batch fails
+            raise OSError(28,"No space left on device")
+
+        writer._flush=disk_full
+        failed=await writer.write("lost\n")
+        with pytest.raises(OSError):
+            await failed
+        assert writer.stats()["errors"] == 1
+        await (await writer.write("kept\n"))
+        assert writer.error is None
+        await writer.stop()
+
+    asyncio.run(run())
+    assert open(path).read() == "kept\n"
@@ -0,0 +1,28 @@
+import asyncio
+import logging
+import math
+
+from processpool import ProcessTaskRunner
+
+
+def test_process_pool_runs_tasks_and_logs_failures(caplog):
+    results=[]
+
+    async def collect(value):
+        results.append(value)
+
+    async def run():
+        runner=ProcessTaskRunner(max_workers=1,max_pending=4)
+        runner.start()
+        assert runner.submit_nowait(math.sqrt,16,then=collect)
+        assert runner.submit_nowait(math.sqrt,-1) # ValueError in the worker process
+        await runner.shutdown()
+        return runner.stats()
+
+    with caplog.at_level(logging.ERROR,logger="processpool"):
+        stats=asyncio.run(run())
+    assert results == [4.0]
+    assert (stats["completed"],stats["failed"],stats["pending"]) == (1,1,0)
+    assert "math domain error" in stats["last_error"]
+    record,=caplog.records
+    assert record.exc_info[0] is ValueError
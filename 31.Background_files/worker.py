@@ -0,0 +1,27 @@
+"""
+Job worker for main.py's queue, run from this folder with: python worker.py [concurrency]
+
+Run as many as needed, they share jobs.db and a job is only leased to one of them at a time.
+"""
+import asyncio
+import signal
+import sys
+
+from jobqueue import Worker
+from main import job_queue,log_writer
+
+
+async def main(concurrency:int):
+    stop=asyncio.Event()
+    loop=asyncio.get_running_loop()
+    for sig in (signal.SIGINT,signal.SIGTERM):
+        loop.add_signal_handler(sig,stop.set)
+    await log_writer.start() # write_notification jobs go through this process's writer
+    try:
+        await Worker(job_queue,concurrency).run(stop)
+    finally:
+        await log_writer.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 64)) # jobs mostly wait on the log flush
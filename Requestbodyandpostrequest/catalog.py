@@ -0,0 +1,103 @@
+from bisect import bisect_left,bisect_right,insort
+from typing import Generic,Iterable,Iterator,TypeVar
+
+from pydantic import BaseModel
+
+# bands validated once when they are added, with an id lookup and secondary indexes for the /bands filters.
+# The indexes are dicts used as ordered sets, so results keep insertion (id) order without sorting.
+# Sorted lists of ids and of (lowercased name or genre, id) let scan() bisect to a cursor and walk from there in
+# either direction, so a page costs the same at any depth.
+
+BandModel=TypeVar("BandModel",bound=BaseModel)
+SORTED_FIELDS=("name","genre")
+
+
+class BandCatalog(Generic[BandModel]):
+    def __init__(self,model:type[BandModel],records:Iterable=()):
+        self.model=model
+        self.by_id:dict[int,BandModel]={}
+        self.by_genre:dict[str,dict[int,None]]={} # lowercased genre -> ids
+        self.with_albums:dict[int,None]={}
+        self.max_id=0
+        self.ids:list[int]=[] # sorted
+        self.sorted_by:dict[str,list[tuple[str,int]]]={field: [] for field in SORTED_FIELDS}
+        for record in records:
+            self.add(record)
+
+    def add(self,record) -> BandModel:
+        band=record if isinstance(record,self.model) else self.model.model_validate(record)
+        if band.id in self.by_id:
+            self.remove(band.id)
+        self.by_id[band.id]=band
+        self.max_id=max(self.max_id,band.id)
+        if not self.ids or band.id > self.ids[-1]:
+            self.ids.append(band.id) # loading in id order stays a plain append
+        else:
+            insort(self.ids,band.id)
+        for field,index in self.sorted_by.items():
+            insort(index,(getattr(band,field).lower(),band.id))
+        self.by_genre.setdefault(band.genre.lower(),{})[band.id]=None
+        if band.albums:
+            self.with_albums[band.id]=None
+        return band
+
+    def remove(self,band_id:int) -> BandModel|None:
+        band=self.by_id.pop(band_id,None)
+        if band is not None:
+            self.by_genre[band.genre.lower()].pop(band_id,None)
+            self.with_albums.pop(band_id,None)
+            del self.ids[bisect_left(self.ids,band_id)]
+            for field,index in self.sorted_by.items():
+                del index[bisect_left(index,(getattr(band,field).lower(),band_id))]
+        return band
+
+    def get(self,band_id:int) -> BandModel|None:
+        return self.by_id.get(band_id)
+
+    def filter(self,genre:str|None=None,has_albums:bool=False) -> list[BandModel]:
+        return list(self.select(genre,has_albums))
+
+    def select(self,genre:str|None=None,has_albums:bool=False) -> Iterator[BandModel]:
+        """Same as filter, but lazily, nothing is collected until the caller pulls it."""
+        indexes=[]
+        if genre:
+            indexes.append(self.by_genre.get(genre.lower(),{}))
+        if has_albums:
+            indexes.append(self.with_albums)
+        if not indexes:
+            return iter(self.by_id.values())
+        # walk the smallest index and probe the others
+        smallest,*rest=sorted(indexes,key=len)
+        return (self.by_id[band_id] for band_id in smallest if all(band_id in index for index in rest))
+
+    def selected(self,genre:str|None=None,has_albums:bool=False) -> int:
+        """Upper bound on how many bands select() yields, without walking anything."""
+        sizes=[len(self)]
+        if genre:
+            sizes.append(len(self.by_genre.get(genre.lower(),{})))
+        if has_albums:
+            sizes.append(len(self.with_albums))
+        return min(sizes)
+
+    def scan(self,sort:str="id",descending:bool=False,after:tuple|None=None,prefix:str|None=None) -> Iterator[BandModel]:
+        """Every band in sort order ("id" or one of SORTED_FIELDS), starting strictly after the key after.
+        prefix limits a name or genre scan to keys that start with it (lowercase)."""
+        index=self.ids if sort == "id" else self.sorted_by[sort]
+        first,last=0,len(index)
+        if prefix and sort != "id":
+            # every key starting with prefix sorts between prefix and prefix with its last character bumped
+            first=bisect_left(index,(prefix,))
+            last=bisect_left(index,(prefix[:-1]+chr(ord(prefix[-1])+1),))
+        if after is not None:
+            key=after[0] if sort == "id" else after
+            if descending:
+                last=min(last,bisect_left(index,key))
+            else:
+                first=max(first,bisect_right(index,key))
+        positions=range(last-1,first-1,-1) if descending else range(first,last)
+        if sort == "id":
+            return (self.by_id[index[position]] for position in positions)
+        return (self.by_id[index[position][1]] for position in positions)
+
+    def __len__(self) -> int:
+        return len(self.by_id)
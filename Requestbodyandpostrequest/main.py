@@ -1,8 +1,11 @@
 from fastapi import FastAPI,HTTPException
 from enum import Enum 
 from schema import Band,General_url_choices,BandBase,BandCreate,Bandwithid
+from catalog import BandCatalog
+from responsecache import ResponseCacheMiddleware,cache_response
 
 app=FastAPI()
+app.add_middleware(ResponseCacheMiddleware) # POST /bands clears the cached /bands listings
 
 
 
@@ -17,33 +20,30 @@ BANDS = [
     {"id": 5, "name": 'the colorado', "genre": 'Rock'},
 
 ]
+catalog=BandCatalog(Bandwithid,BANDS) # validated once here, the routes only look things up
 
 
 @app.get("/bands")
+@cache_response(ttl=60)
 async def Bands(genre : General_url_choices |None=None,has_albums:bool=False) -> list[Bandwithid]:
-    band_list=[Bandwithid(**b) for b in BANDS]
-    if genre: 
-        band_list=[b for b in band_list if b.genre.lower() == genre.value ]# if query parameters
-    if has_albums:
-        band_list=[b for b in band_list if len(b.albums) >0]
-    return band_list
+    return catalog.filter(genre=genre.value if genre else None,has_albums=has_albums) # if query parameters
     
 
 @app.get("/bands/{band_id}")
 async def band(band_id: int) -> Bandwithid:
-    band=next((Bandwithid(**b) for b in BANDS if b["id"]==band_id),None)
+    band=catalog.get(band_id)
     if band is None:
         raise HTTPException(status_code=404, detail="Band not found")
     return band
 
-@app.get("/bands/genre/{genre}")
-async def band_for_genre(genre:General_url_choices) -> list[dict]:
-    return [
-        b for b in BANDS if b['genre'].lower() == genre.value.lower()
-    ]
+@app.get("/bands/genre/{genre}",response_model_exclude_unset=True) # the records as given, no albums: [] added
+@cache_response(ttl=60)
+async def band_for_genre(genre:General_url_choices) -> list[Bandwithid]:
+    return catalog.filter(genre=genre.value)
 
 
 @app.post("/bands")
 async def create_band(band_data: BandCreate) -> Bandwithid:
-    id =BANDS[-1]['id']+1
+    id =catalog.max_id+1
     band=Bandwithid(id=id,**band_data.model_dump())
+    return catalog.add(band)
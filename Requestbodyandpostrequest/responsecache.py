@@ -0,0 +1,149 @@
+import time
+from collections import OrderedDict
+
+from starlette.datastructures import Headers,MutableHeaders
+from starlette.types import ASGIApp,Message,Receive,Scope,Send
+
+# whole-response cache for GET routes that opt in with @cache_response(ttl=...). Hits are answered before routing,
+# so validation, dependencies and serialization are skipped. Entries are keyed on method, path, query string and
+# the request headers named in the response's Vary (the configured ones plus e.g. Accept-Encoding from compression).
+# A successful POST/PUT/PATCH/DELETE drops every entry under the same top-level path, /bands/7 clears /bands...
+
+SAFE_METHODS=("GET","HEAD","OPTIONS") # OPTIONS is never cached, but a preflight must not clear the cache either
+
+
+def cache_response(ttl:int=60,vary:tuple[str,...]=()):
+    """Opt the decorated GET endpoint in, vary names request headers that change the response (e.g. X-Token)."""
+    def decorate(endpoint):
+        endpoint.response_cache=(ttl,vary)
+        return endpoint
+    return decorate
+
+
+class ResponseCache:
+    """Bounded LRU of finished responses, only ever touched from the event loop so no locking is needed."""
+
+    def __init__(self,maxsize:int=512):
+        self.maxsize=maxsize
+        # key -> (expires, stored at, route, status, headers, body)
+        self._entries:OrderedDict[tuple,tuple]=OrderedDict()
+        # (method, path, query) -> the header names the stored response varies on, and how many entries use it.
+        # Dropped with its last entry, so it is bounded by maxsize too
+        self.vary:dict[tuple,tuple[str,...]]={}
+        self._counts:dict[tuple,int]={}
+        self.hits=self.misses=self.evictions=0
+
+    def key(self,primary:tuple,headers:Headers) -> tuple|None:
+        vary=self.vary.get(primary)
+        return None if vary is None else primary+tuple(headers.get(name) for name in vary)
+
+    def get(self,key:tuple|None):
+        entry=self._entries.get(key) if key else None
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._drop(key)
+                self.evictions+=1
+            self.misses+=1
+            return None
+        self._entries.move_to_end(key)
+        self.hits+=1
+        return entry
+
+    def put(self,primary:tuple,vary:tuple[str,...],headers:Headers,ttl:int,route,status:int,raw_headers:list,body:bytes):
+        self.vary[primary]=vary
+        now=time.monotonic()
+        key=primary+tuple(headers.get(name) for name in vary)
+        if key not in self._entries:
+            self._counts[primary]=self._counts.get(primary,0)+1
+        self._entries[key]=(now+ttl,now,route,status,raw_headers,body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._drop(next(iter(self._entries)))
+            self.evictions+=1
+
+    def _drop(self,key:tuple):
+        del self._entries[key]
+        primary=key[:3]
+        self._counts[primary]-=1
+        if not self._counts[primary]:
+            del self._counts[primary]
+            self.vary.pop(primary,None)
+
+    def invalidate(self,prefix:str="/"):
+        for key in [key for key in self._entries if key[1].startswith(prefix)]:
+            self._drop(key)
+
+    def stats(self) -> dict:
+        return dict(hits=self.hits,misses=self.misses,evictions=self.evictions,size=len(self._entries),maxsize=self.maxsize)
+
+
+class ResponseCacheMiddleware:
+    def __init__(self,app:ASGIApp,cache:ResponseCache|None=None,max_body:int=1<<20):
+        self.app=app
+        self.cache=cache if cache is not None else ResponseCache()
+        self.max_body=max_body # bigger responses are passed through and never stored
+
+    async def __call__(self,scope:Scope,receive:Receive,send:Send):
+        if scope["type"] != "http":
+            await self.app(scope,receive,send)
+            return
+        if scope["method"] not in SAFE_METHODS:
+            await self.invalidating(scope,receive,send)
+            return
+
+        headers=Headers(scope=scope)
+        primary=(scope["method"],scope["path"],scope["query_string"])
+        entry=self.cache.get(self.cache.key(primary,headers))
+        if entry is not None:
+            _,stored,scope["route"],status,raw_headers,body=entry # the route keeps metrics labelled by template
+            await send({"type": "http.response.start","status": status,
+                        "headers": raw_headers+[(b"age",str(int(time.monotonic()-stored)).encode())]})
+            await send({"type": "http.response.body","body": body})
+            return
+
+        start_message:Message|None=None
+        policy=None
+        chunks:list[bytes]=[]
+        size=0
+
+        async def send_and_store(message:Message):
+            nonlocal start_message,policy,size
+            if message["type"] == "http.response.start":
+                endpoint=getattr(scope.get("route"),"endpoint",None)
+                policy=getattr(endpoint,"response_cache",None) if message["status"] == 200 else None
+                if policy:
+                    ttl,vary=policy
+                    response_headers=MutableHeaders(scope=message)
+                    for name in vary:
+                        response_headers.add_vary_header(name)
+                    response_headers["Cache-Control"]=f"max-age={ttl}"
+                    response_headers["Age"]="0"
+                    start_message=message
+                await send(message)
+                return
+            if policy and message["type"] == "http.response.body":
+                body=message.get("body",b"")
+                size+=len(body)
+                chunks.append(body)
+                if size > self.max_body:
+                    policy=None
+                elif not message.get("more_body",False):
+                    self.store(scope,primary,headers,policy[0],start_message,b"".join(chunks))
+            await send(message)
+
+        await self.app(scope,receive,send_and_store)
+
+    def store(self,scope:Scope,primary:tuple,headers:Headers,ttl:int,start_message:Message,body:bytes):
+        raw_headers=[(name,value) for name,value in start_message["headers"] if name != b"age"] # worked out on every hit
+        vary=tuple(name.strip().lower() for name in Headers(raw=raw_headers).get("vary","").split(",") if name.strip())
+        if "*" in vary:
+            return
+        self.cache.put(primary,vary,headers,ttl,scope.get("route"),start_message["status"],raw_headers,body)
+
+    async def invalidating(self,scope:Scope,receive:Receive,send:Send):
+        async def send_and_invalidate(message:Message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                self.cache.invalidate("/"+scope["path"].lstrip("/").split("/",1)[0])
+            await send(message)
+
+        await self.app(scope,receive,send_and_invalidate)
@@ -0,0 +1,83 @@
+"""
+/bands filtering on a synthetic catalog, run from this folder with: python bench.py [bands]
+
+The first version validated every record into a Band and scanned the list on each request, BandCatalog
+validates once on load and answers from its indexes. bench_query pages through it with BandQuery.
+"""
+import random
+import sys
+import time
+from datetime import date
+
+from catalog import BandCatalog
+from query import BandQuery,BandSort,page_response
+from schema import Band
+
+GENRES=("Rock","Electronic","soothing","metal","Jazz","Folk","Pop","Blues")
+
+
+def synthetic_bands(count:int) -> list[dict]:
+    rng=random.Random(7)
+    bands=[]
+    for band_id in range(1,count+1):
+        band={"id": band_id,"name": f"band {band_id}","genre": rng.choice(GENRES)}
+        if rng.random() < 0.05: # a few bands have released something
+            band["albums"]=[{"title": f"album {band_id}","release_date": f"19{rng.randint(60,99)}-0{rng.randint(1,9)}-1{rng.randint(0,9)}"}]
+        bands.append(band)
+    return bands
+
+
+def scan(bands:list[dict],genre:str|None,has_albums:bool) -> list[Band]:
+    # the body of the old /bands route
+    band_list=[Band(**b) for b in bands]
+    if genre:
+        band_list=[b for b in band_list if b.genre.lower() == genre ]
+    if has_albums:
+        band_list=[b for b in band_list if len(b.albums) >0]
+    return band_list
+
+
+def timed(run,rounds:int) -> tuple[float,object]:
+    start=time.perf_counter()
+    for _ in range(rounds):
+        result=run()
+    return (time.perf_counter()-start)/rounds,result
+
+
+def bench_catalog(count:int=1_000_000):
+    bands=synthetic_bands(count)
+    load,catalog=timed(lambda: BandCatalog(Band,bands),1)
+    print(f"{count} bands, catalog built in {load:.2f} s")
+    queries=(("genre=rock",dict(genre="rock",has_albums=False)),
+             ("has_albums=true",dict(genre=None,has_albums=True)),
+             ("genre=rock&has_albums=true",dict(genre="rock",has_albums=True)))
+    for name,query in queries:
+        old,expected=timed(lambda: scan(bands,**query),1)
+        new,found=timed(lambda: catalog.filter(**query),20)
+        assert [b.id for b in found] == [b.id for b in expected]
+        print(f"  /bands?{name:<27} scan {old*1000:9.1f} ms   catalog {new*1000:8.3f} ms   {len(found)} bands")
+    band_id=count-1
+    old,_=timed(lambda: next((Band(**b) for b in bands if b["id"]==band_id),None),3)
+    new,_=timed(lambda: catalog.get(band_id),100_000)
+    print(f"  /bands/{{band_id}} near the end     scan {old*1000:9.1f} ms   catalog {new*1e6:8.3f} us")
+    return catalog
+
+
+def bench_query(catalog:BandCatalog,limit:int=20):
+    print(f"pages of {limit} through BandQuery, serialized with fields=id,name")
+    queries=(("sort=id",dict()),
+             ("sort=id, cursor 90% of the way in",dict(cursor="cursor")),
+             ("sort=-id",dict(sort=BandSort.ID_DESC)),
+             ("sort=-name",dict(sort=BandSort.NAME_DESC)),
+             ("name_prefix=band 99&sort=name",dict(name_prefix="band 99",sort=BandSort.NAME)),
+             ("genre=rock&released_after=1990-01-01",dict(genre="rock",released_after=date(1990,1,1))))
+    for name,query in queries:
+        if query.get("cursor"):
+            query["cursor"]=BandQuery(limit=int(len(catalog)*0.9)).page(catalog)[1]
+        elapsed,_=timed(lambda: page_response(*BandQuery(limit=limit,**query).page(catalog),{"id","name"}),5)
+        print(f"  {name:<38} {elapsed*1000:9.3f} ms")
+
+
+if __name__ == "__main__":
+    catalog=bench_catalog(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
+    bench_query(catalog)
@@ -0,0 +1,44 @@
+import importlib.util
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from compression import CompressionMiddleware
+from responsecache import ResponseCache,ResponseCacheMiddleware,cache_response
+
+
+@pytest.fixture
+def cached_app():
+    # a tiny app instead of main.app, so each test starts from an empty cache and can count endpoint calls
+    app=FastAPI()
+    app.state.cache=ResponseCache(maxsize=8)
+    app.state.calls=[]
+    app.add_middleware(CompressionMiddleware)
+    app.add_middleware(ResponseCacheMiddleware,cache=app.state.cache)
+
+    @app.get("/bands")
+    @cache_response(ttl=60)
+    async def bands(q:str=""):
+        app.state.calls.append(q)
+        return [{"name": "the kinks "*20}]*10
+
+    @app.post("/bands")
+    async def create_band():
+        return {}
+
+    return app
+
+@pytest.fixture
+def cached_client(cached_app):
+    return TestClient(cached_app)
+
+
+@pytest.fixture
+def bands_client():
+    # main.py loaded from its path under its own name, other lessons have a main module too
+    spec=importlib.util.spec_from_file_location("bands_main",os.path.join(os.path.dirname(__file__),"main.py"))
+    main=importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(main)
+    return TestClient(main.app)
@@ -1,8 +1,15 @@
-from fastapi import FastAPI,HTTPException
+from fastapi import FastAPI,HTTPException,Query,Response
+from datetime import date
 from enum import Enum 
 from schema import Band,General_url_choices
+from catalog import BandCatalog
+from query import BandQuery,BandSort,page_response,parse_fields
+from compression import CompressionMiddleware
+from responsecache import ResponseCacheMiddleware,cache_response
 
 app=FastAPI()
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ResponseCacheMiddleware) # outermost, so hits skip compressing again and vary on Accept-Encoding
 
 
 
@@ -17,27 +24,29 @@ BANDS = [
     {"id": 5, "name": 'the colorado', "genre": 'Rock'},
 
 ]
-
-
-@app.get("/bands")
-async def Bands(genre : General_url_choices |None=None,has_albums:bool=False) -> list[Band]:
-    band_list=[Band(**b) for b in BANDS]
-    if genre: 
-        band_list=[b for b in band_list if b.genre.lower() == genre.value ]# if query parameters
-    if has_albums:
-        band_list=[b for b in band_list if len(b.albums) >0]
-    return band_list
+catalog=BandCatalog(Band,BANDS) # validated once here, the routes only look things up
+
+
+@app.get("/bands",response_model=list[Band])
+@cache_response(ttl=60)
+async def Bands(genre : General_url_choices |None=None,has_albums:bool=False,name_prefix:str|None=None,
+                released_after:date|None=None,released_before:date|None=None,sort:BandSort=BandSort.ID,
+                limit:int=Query(100,ge=1,le=1000),cursor:str|None=None,fields:str|None=None) -> Response:
+    # fields=name,genre serializes only those, the next page is in the X-Next-Cursor header
+    query=BandQuery(genre=genre.value if genre else None,has_albums=has_albums,name_prefix=name_prefix,# if query parameters
+                    released_after=released_after,released_before=released_before,sort=sort,limit=limit,cursor=cursor)
+    page,next_cursor=query.page(catalog)
+    return page_response(page,next_cursor,parse_fields(fields,Band))
     
 
 @app.get("/bands/{band_id}")
 async def band(band_id: int) -> Band:
-    band=next((Band(**b) for b in BANDS if b["id"]==band_id),None)
+    band=catalog.get(band_id)
     if band is None:
         raise HTTPException(status_code=404, detail="Band not found")
     return band
 
-@app.get("/bands/genre/{genre}")
-async def band_for_genre(genre:General_url_choices) -> list[dict]:
-    return [
-        b for b in BANDS if b['genre'].lower() == genre.value.lower()
-    ]
+@app.get("/bands/genre/{genre}",response_model_exclude_unset=True) # the records as given, no albums: [] added
+@cache_response(ttl=60)
+async def band_for_genre(genre:General_url_choices) -> list[Band]:
+    return catalog.filter(genre=genre.value)
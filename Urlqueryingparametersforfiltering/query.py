@@ -0,0 +1,124 @@
+import base64
+import heapq
+import json
+from datetime import date
+from enum import Enum
+from itertools import islice
+from typing import Iterator
+
+from fastapi import HTTPException,Response
+from pydantic import BaseModel
+
+from catalog import BandCatalog
+
+# /bands queries as a pipeline of generators over the catalog indexes. Nothing is collected beyond the page:
+# normally the catalog's sorted index is walked from the cursor and stops after limit+1 matching bands, so a deep
+# page costs the same as the first. When a genre/has_albums index is so small that walking the sort order would
+# skip over many more bands than it holds, that index is read whole into a limit+1 sized heap instead.
+# The cursor carries the sort key of the last band returned, the next page starts strictly after it.
+
+
+class BandSort(str,Enum):
+    ID="id"
+    ID_DESC="-id"
+    NAME="name"
+    NAME_DESC="-name"
+    GENRE="genre"
+    GENRE_DESC="-genre"
+
+
+SORT_KEYS={
+    "id": lambda band: (band.id,),
+    "name": lambda band: (band.name.lower(),band.id), # id breaks ties so every key, and cursor, is unique
+    "genre": lambda band: (band.genre.lower(),band.id),
+}
+KEY_TYPES={"id": (int,),"name": (str,int),"genre": (str,int)} # what a cursor for each sort has to carry
+
+
+def encode_cursor(sort:BandSort,key:tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort.value,*key]).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor:str|None,sort:BandSort) -> tuple|None:
+    if cursor is None:
+        return None
+    try:
+        found,*key=json.loads(base64.urlsafe_b64decode(cursor+"="*(-len(cursor)%4)))
+    except (ValueError,TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    types=KEY_TYPES[sort.value.lstrip("-")]
+    # a cursor only means something for the sort it came from, and a key of any other shape would not compare
+    if (found != sort.value or len(key) != len(types)
+            or any(type(value) is not expected for value,expected in zip(key,types))):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(key)
+
+
+def parse_fields(fields:str|None,model:type[BaseModel]) -> set[str]|None:
+    if not fields:
+        return None
+    wanted={field.strip() for field in fields.split(",") if field.strip()}
+    unknown=wanted-model.model_fields.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return wanted
+
+
+class BandQuery:
+    def __init__(self,genre:str|None=None,has_albums:bool=False,name_prefix:str|None=None,
+                 released_after:date|None=None,released_before:date|None=None,sort:BandSort=BandSort.ID,
+                 limit:int=100,cursor:str|None=None):
+        self.genre=genre
+        self.has_albums=has_albums
+        self.name_prefix=name_prefix.lower() if name_prefix else None
+        self.released=(released_after or date.min,released_before or date.max) if released_after or released_before else None
+        self.sort=sort
+        self.descending=sort.value.startswith("-")
+        self.key=SORT_KEYS[sort.value.lstrip("-")]
+        self.limit=limit
+        self.after=decode_cursor(cursor,sort)
+
+    def filtered(self,bands:Iterator) -> Iterator:
+        if self.genre:
+            genre=self.genre.lower()
+            bands=(band for band in bands if band.genre.lower() == genre)
+        if self.has_albums:
+            bands=(band for band in bands if band.albums)
+        return self.matching(bands)
+
+    def matching(self,bands:Iterator) -> Iterator:
+        if self.name_prefix:
+            bands=(band for band in bands if band.name.lower().startswith(self.name_prefix))
+        if self.released:
+            first,last=self.released
+            bands=(band for band in bands if any(first <= album.release_date <= last for album in band.albums))
+        return bands
+
+    def page(self,catalog:BandCatalog) -> tuple[list,str|None]:
+        """Up to limit bands and the cursor for the next page, None on the last page."""
+        # a band with any album released in the range counts, so the index has to have albums at all
+        has_albums=self.has_albums or self.released is not None
+        selected=catalog.selected(self.genre,has_albums)
+        field=self.sort.value.lstrip("-")
+        if selected*selected < (self.limit+1)*len(catalog):
+            # about limit*N/selected bands to walk in sort order against selected to heap, the index is cheaper
+            bands=self.matching(catalog.select(self.genre,has_albums))
+            if self.after is not None:
+                key,after=self.key,self.after
+                bands=(band for band in bands if (key(band) < after if self.descending else key(band) > after))
+            pick=heapq.nlargest if self.descending else heapq.nsmallest
+            page=pick(self.limit+1,bands,key=self.key)
+        else:
+            prefix={"name": self.name_prefix,"genre": self.genre.lower() if self.genre else None}.get(field)
+            bands=self.filtered(catalog.scan(field,self.descending,self.after,prefix))
+            page=list(islice(bands,self.limit+1))
+        if len(page) <= self.limit:
+            return page,None
+        page=page[:self.limit]
+        return page,encode_cursor(self.sort,self.key(page[-1]))
+
+
+def page_response(page:list,next_cursor:str|None,fields:set[str]|None) -> Response:
+    # only the requested fields are serialized, straight from the validated models
+    body="["+",".join(band.model_dump_json(include=fields) for band in page)+"]"
+    headers={"X-Next-Cursor": next_cursor} if next_cursor else None # pass it back as ?cursor= for the next page
+    return Response(content=body,media_type="application/json",headers=headers)
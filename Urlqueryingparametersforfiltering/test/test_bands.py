@@ -0,0 +1,97 @@
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from catalog import BandCatalog
+from query import SORT_KEYS,BandQuery,BandSort,decode_cursor
+from schema import Band
+
+
+def test_response_cache_hit_and_age(cached_app,cached_client):
+    first=cached_client.get("/bands",headers={"Accept-Encoding": "identity"})
+    assert first.headers["cache-control"] == "max-age=60"
+    assert first.headers["age"] == "0"
+    second=cached_client.get("/bands",headers={"Accept-Encoding": "identity"})
+    assert second.json() == first.json()
+    assert "age" in second.headers
+    assert cached_app.state.calls == [""] # the second one never reached the endpoint
+    assert cached_app.state.cache.stats()["hits"] == 1
+
+def test_response_cache_keys_on_query_and_vary(cached_app,cached_client):
+    gzipped=cached_client.get("/bands",headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    cached_client.get("/bands",headers={"Accept-Encoding": "gzip"})
+    plain=cached_client.get("/bands",headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers # not served the gzip entry
+    cached_client.get("/bands?q=rock",headers={"Accept-Encoding": "gzip"})
+    assert cached_app.state.calls == ["","","rock"]
+
+def test_response_cache_invalidated_by_post_not_options(cached_app,cached_client):
+    cached_client.get("/bands")
+    cached_client.options("/bands")
+    cached_client.get("/bands")
+    assert cached_app.state.calls == [""]
+    assert cached_client.post("/bands").status_code == 200
+    cached_client.get("/bands")
+    assert cached_app.state.calls == ["",""]
+
+def test_response_cache_vary_index_is_bounded(cached_app,cached_client):
+    for n in range(50):
+        cached_client.get(f"/bands?q={n}")
+    cache=cached_app.state.cache
+    assert cache.stats()["size"] == 8
+    assert len(cache.vary) == 8
+
+def cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode()
+
+def test_cursor_shape_is_checked_against_the_sort():
+    assert decode_cursor(cursor("name","the kinks",1),BandSort.NAME) == ("the kinks",1)
+    assert decode_cursor(cursor("-id",4),BandSort.ID_DESC) == (4,)
+    for bad,sort in ((cursor("name",5,"x"),BandSort.NAME),(cursor("id","1"),BandSort.ID),(cursor("id",True),BandSort.ID),
+                     (cursor("genre","rock"),BandSort.GENRE),(cursor("id",1),BandSort.NAME),("not a cursor",BandSort.ID),
+                     (base64.urlsafe_b64encode(b"5").decode(),BandSort.ID)):
+        with pytest.raises(HTTPException) as error:
+            decode_cursor(bad,sort)
+        assert error.value.status_code == 400
+
+def paged(catalog,limit=3,**query):
+    ids,cursor=[],None
+    while True:
+        page,cursor=BandQuery(limit=limit,cursor=cursor,**query).page(catalog)
+        ids+=[band.id for band in page]
+        if cursor is None:
+            return ids
+
+def test_pages_seek_the_sorted_indexes():
+    genres=("Rock","metal","rock","Jazz")
+    catalog=BandCatalog(Band,[{"id": band_id,"name": f"{'ab'[band_id%2]} {band_id%5}","genre": genres[band_id%4]}
+                              for band_id in (9,3,14,1,7,12,5,2,11,8)])
+    catalog.remove(12)
+    bands=list(catalog.by_id.values())
+    for sort in BandSort:
+        expected=sorted(bands,key=SORT_KEYS[sort.value.lstrip("-")],reverse=sort.value.startswith("-"))
+        assert paged(catalog,sort=sort) == [band.id for band in expected]
+    assert paged(catalog,sort=BandSort.NAME,name_prefix="B") == [band.id for band in sorted(bands,key=SORT_KEYS["name"]) if band.name.startswith("b")]
+    assert paged(catalog,sort=BandSort.GENRE_DESC,genre="rock") == sorted((band.id for band in bands if band.genre.lower() == "rock"),reverse=True)
+    # a cursor past the end of the index is just an empty page
+    assert list(catalog.scan("id",after=(99,))) == [] and [band.id for band in catalog.scan("id",True,(99,))][:2] == [14,11]
+
+def test_catalog_indexes_follow_add_and_remove():
+    catalog=BandCatalog(Band,[{"id": 2,"name": "b","genre": "Rock"},{"id": 1,"name": "a","genre": "rock",
+                                "albums": [{"title": "x","release_date": "1990-01-01"}]}])
+    assert [band.id for band in catalog.filter(genre="ROCK")] == [2,1] # insertion order
+    assert [band.id for band in catalog.filter(genre="rock",has_albums=True)] == [1]
+    catalog.add({"id": 1,"name": "a","genre": "metal"}) # same id again replaces the band and its index entries
+    assert [band.id for band in catalog.filter(genre="rock")] == [2]
+    assert catalog.filter(has_albums=True) == [] and [band.id for band in catalog.filter(genre="metal")] == [1]
+    assert catalog.remove(2).name == "b" and catalog.remove(2) is None
+    assert catalog.get(2) is None and catalog.filter(genre="rock") == []
+    assert (len(catalog),catalog.ids,catalog.sorted_by["genre"]) == (1,[1],[("metal",1)])
+
+def test_bands_for_genre_keeps_the_record_shape(bands_client):
+    assert bands_client.get("/bands/genre/rock").json() == [{"id": 1,"name": "the kinks","genre": "Rock"},
+                                                            {"id": 5,"name": "the colorado","genre": "Rock"}]
+    assert bands_client.get("/bands/genre/soothing").json()[0]["albums"] == [{"title": "Master of reality","release_date": "1982-09-12"}]
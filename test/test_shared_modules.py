@@ -0,0 +1,23 @@
+from pathlib import Path
+
+import pytest
+
+# every lesson folder runs on its own (uvicorn main:app from inside it), so modules several lessons use are copied
+# into each of them instead of imported from one place. This keeps the copies identical, a fix has to land in all.
+
+ROOT=Path(__file__).resolve().parent.parent
+COPIES={
+    "compression.py": ["28.Middleware_And_Cors","29.Sql_Relational_Database/app","Urlqueryingparametersforfiltering"],
+    "metrics.py": ["28.Middleware_And_Cors","29.Sql_Relational_Database/app","30.Bigger_Aplications_Multiple_Files/subapp"],
+    "responsecache.py": ["Urlqueryingparametersforfiltering","Requestbodyandpostrequest","30.Bigger_Aplications_Multiple_Files/subapp"],
+    "ratelimit.py": ["26.Security","27.SecuritywithJWT"],
+    "userstore.py": ["26.Security","27.SecuritywithJWT"],
+    "catalog.py": ["Urlqueryingparametersforfiltering","Requestbodyandpostrequest"],
+}
+
+
+@pytest.mark.parametrize("name",sorted(COPIES))
+def test_copies_are_identical(name):
+    sources={folder: (ROOT/folder/name).read_text() for folder in COPIES[name]} # text mode folds the CRLF some lessons use
+    first=next(iter(sources.values()))
+    assert [folder for folder,source in sources.items() if source != first] == []